@@ -15,7 +15,7 @@ from hyp3lib.fetch import write_credentials_to_netrc_file
 from hyp3lib.image import create_thumbnail
 from hyp3lib.util import string_is_true
 
-from hyp3_gamma import util
+from hyp3_gamma import prefetch, util
 from hyp3_gamma.insar.ifm_sentinel import insar_sentinel_gamma
 from hyp3_gamma.rtc.rtc_sentinel import rtc_sentinel_gamma
 
@@ -95,6 +95,8 @@ def rtc():
     parser.add_argument('--include-scattering-area', type=string_is_true, default=False)
     parser.add_argument('--include-rgb', type=string_is_true, default=False)
     parser.add_argument('--dem-name', choices=['copernicus'], default='copernicus')
+    parser.add_argument('--concurrent-polarizations', type=string_is_true, default=False)
+    parser.add_argument('--reuse-pixel-area', type=string_is_true, default=False)
     parser.add_argument('granule')
     args = parser.parse_args()
 
@@ -106,7 +108,9 @@ def rtc():
 
     write_credentials_to_netrc_file(username, password)
 
+    prefetch_thread = prefetch.start_prefetch(args.granule)
     safe_dir = util.get_granule(args.granule)
+    prefetch.join_prefetch(prefetch_thread)
 
     product_name = rtc_sentinel_gamma(
         safe_dir=safe_dir,
@@ -120,6 +124,8 @@ def rtc():
         include_scattering_area=args.include_scattering_area,
         include_rgb=args.include_rgb,
         dem_name=args.dem_name,
+        concurrent_polarizations=args.concurrent_polarizations,
+        reuse_pixel_area=args.reuse_pixel_area,
     )
     output_zip = make_archive(base_name=product_name, format='zip', base_dir=product_name)
 
@@ -177,8 +183,10 @@ def insar():
     write_credentials_to_netrc_file(username, password)
 
     g1, g2 = util.earlier_granule_first(args.granules[0], args.granules[1])
+    prefetch_thread = prefetch.start_prefetch(g1, include_water_mask=True)
     reference_granule = util.get_granule(g1)
     secondary_granule = util.get_granule(g2)
+    prefetch.join_prefetch(prefetch_thread)
 
     rlooks, alooks = (20, 4) if args.looks == '20x4' else (10, 2)
 
@@ -0,0 +1,116 @@
+"""Split polygons on the antimeridian in-process, with the semantics of `ogr2ogr -wrapdateline`"""
+from typing import List
+
+from shapely import geometry
+from shapely.affinity import translate
+from shapely.geometry.base import BaseGeometry
+
+EAST_HALF = geometry.box(0, -90, 180, 90)
+EAST_WRAPPED_HALF = geometry.box(180, -90, 360, 90)
+WEST_HALF = geometry.box(-180, -90, 0, 90)
+WEST_WRAPPED_HALF = geometry.box(-360, -90, -180, 90)
+
+
+def _fix_ring_at_dateline(coordinates: List[tuple], offset: float) -> List[tuple]:
+    left_border = 180 - offset
+    right_border = -180 + offset
+    diff_space = 360 - offset
+
+    coordinates = [list(coordinate) for coordinate in coordinates]
+    go_east = False
+    for i in range(1, len(coordinates)):
+        x = coordinates[i][0]
+        previous_x = coordinates[i - 1][0]
+        if abs(x - previous_x) > diff_space:
+            if (previous_x > left_border and x < right_border) or (x < 0 and go_east):
+                coordinates[i][0] = x + 360
+                go_east = True
+            elif previous_x < right_border and x > left_border:
+                for j in range(i - 1, -1, -1):
+                    if coordinates[j][0] < 0:
+                        coordinates[j][0] += 360
+                go_east = False
+            else:
+                go_east = False
+    return [tuple(coordinate) for coordinate in coordinates]
+
+
+def _polygons(geom: BaseGeometry) -> List[geometry.Polygon]:
+    if geom.is_empty:
+        return []
+    if geom.geom_type == 'Polygon':
+        return [geom]
+    if geom.geom_type in ('MultiPolygon', 'GeometryCollection'):
+        return [polygon for part in geom.geoms for polygon in _polygons(part)]
+    return []
+
+
+def _cut_polygon(polygon: geometry.Polygon, offset: float) -> List[geometry.Polygon]:
+    min_x, _, max_x, _ = polygon.bounds
+    around_minus_180 = min_x < -180
+
+    left_border = 180 - offset
+    right_border = -180 + offset
+    diff_space = 360 - offset
+    x_offset = 360 if around_minus_180 else 0
+
+    if min_x < -180 or max_x > 180 or (min_x + x_offset > left_border and max_x + x_offset > 180):
+        work_polygon = polygon
+    else:
+        coordinates = list(polygon.exterior.coords)
+        has_big_diff = False
+        max_small_diff = 0
+        for previous, current in zip(coordinates, coordinates[1:]):
+            previous_x = previous[0] + x_offset
+            x = current[0] + x_offset
+            diff = abs(x - previous_x)
+            if diff > diff_space and ((x > left_border and previous_x < right_border)
+                                      or (previous_x > left_border and x < right_border)):
+                has_big_diff = True
+            elif diff > max_small_diff:
+                max_small_diff = diff
+
+        if not (has_big_diff and max_small_diff < offset):
+            return [polygon]
+
+        work_polygon = geometry.Polygon(
+            _fix_ring_at_dateline(polygon.exterior.coords, offset),
+            [_fix_ring_at_dateline(interior.coords, offset) for interior in polygon.interiors],
+        )
+
+    if around_minus_180:
+        half, wrapped_half, shift = WEST_HALF, WEST_WRAPPED_HALF, 360
+    else:
+        half, wrapped_half, shift = EAST_HALF, EAST_WRAPPED_HALF, -360
+
+    wrapped = translate(work_polygon.intersection(wrapped_half), xoff=shift)
+    return _polygons(work_polygon.intersection(half)) + _polygons(wrapped)
+
+
+def wrap_dateline(geom: BaseGeometry, offset: float = 20.0) -> BaseGeometry:
+    """Split a polygon crossing the antimeridian into parts with longitudes in [-180, 180]
+
+    Follows `ogr2ogr -wrapdateline -datelineoffset <offset>`: polygons entirely beyond +/-180 degrees are shifted by
+    360 degrees, and polygons crossing the antimeridian, either with longitudes beyond +/-180 degrees or with edges
+    jumping between longitudes within `offset` degrees of it, are split on it.
+
+    Args:
+        geom: A Polygon or MultiPolygon with WGS84 longitude/latitude coordinates
+        offset: Distance in degrees from the antimeridian within which edges may jump across it
+
+    Returns:
+        wrapped: The Polygon or MultiPolygon split on the antimeridian
+    """
+    if geom.geom_type not in ('Polygon', 'MultiPolygon'):
+        raise ValueError(f'Unable to wrap {geom.geom_type} geometries on the antimeridian')
+
+    min_x, _, max_x, _ = geom.bounds
+    if min_x >= -360 and max_x <= -180:
+        return translate(geom, xoff=360)
+    if min_x >= 180 and max_x <= 360:
+        return translate(geom, xoff=-360)
+
+    parts = [part for polygon in _polygons(geom) for part in _cut_polygon(polygon, offset)]
+    if len(parts) == 1:
+        return parts[0]
+    return geometry.MultiPolygon(parts)
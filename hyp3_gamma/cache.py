@@ -0,0 +1,95 @@
+"""Size-bounded on-disk file cache shared by the workers on a host"""
+import fcntl
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from stat import S_ISREG
+from tempfile import TemporaryDirectory
+from typing import Generator, Optional
+
+log = logging.getLogger(__name__)
+
+
+class FileCache:
+    """Directory of cached files that are evicted least recently used first once the cache exceeds a byte budget
+
+    Files are added by renaming them into place from a temporary directory inside the cache, so concurrent workers
+    never see partially written files. Eviction holds an exclusive lock on the cache and never removes files used
+    within the last `min_age` seconds, which may still be open by another worker.
+    """
+    def __init__(self, directory: Path, max_bytes: int, min_age: float = 3600.0):
+        """
+        Args:
+            directory: Path to the cache directory; created if it does not exist
+            max_bytes: Total size of the cached files to evict down to
+            min_age: Seconds since last use before a file may be evicted
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Path]:
+        """Get the path of a cached file, marking it as recently used
+
+        Args:
+            key: Relative path of the file in the cache
+
+        Returns:
+            path: Path to the cached file, or None if it is not cached
+        """
+        path = self.directory / key
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def temporary_directory(self) -> Generator[Path, None, None]:
+        """Context manager for a scratch directory on the same file system as the cache, to fill new files in"""
+        with TemporaryDirectory(prefix='.incoming-', dir=self.directory) as temp_dir:
+            yield Path(temp_dir)
+
+    def put(self, key: str, file: Path) -> Path:
+        """Atomically move a file into the cache, then evict files if the cache is over budget
+
+        Args:
+            key: Relative path of the file in the cache
+            file: Path to the file to add, typically inside `temporary_directory()`
+
+        Returns:
+            path: Path to the cached file
+        """
+        path = self.directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(file, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove least recently used files until the cache is within `max_bytes`"""
+        with open(self.directory / '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            cached_files = []
+            for path in self.directory.rglob('*'):
+                if any(part.startswith('.') for part in path.relative_to(self.directory).parts):
+                    continue
+                try:
+                    path_stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if S_ISREG(path_stat.st_mode):
+                    cached_files.append((path_stat.st_mtime, path_stat.st_size, path))
+
+            total_bytes = sum(size for _, size, _ in cached_files)
+            oldest_allowed = time.time() - self.min_age
+            for last_used, size, path in sorted(cached_files):
+                if total_bytes <= self.max_bytes or last_used > oldest_allowed:
+                    break
+                log.info(f'Evicting {path} from {self.directory}')
+                path.unlink(missing_ok=True)
+                total_bytes -= size
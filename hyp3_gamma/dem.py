@@ -1,26 +1,46 @@
 import json
+import logging
+import math
+import multiprocessing
+import os
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from subprocess import PIPE, run
 from tempfile import TemporaryDirectory
-from typing import Generator, List
+from typing import Generator, List, Optional, Tuple
+from urllib.parse import urlparse
 
+import numpy as np
 from hyp3lib import DemError
-from osgeo import gdal, ogr
+from hyp3lib.fetch import download_file
+from lxml import etree
+from osgeo import gdal, ogr, osr
+from shapely.geometry import Polygon
 
-from hyp3_gamma.util import GDALConfigManager
+from hyp3_gamma import antimeridian
+from hyp3_gamma.cache import FileCache
+from hyp3_gamma.gamma_io import open_raster, read_gamma_par
+from hyp3_gamma.util import GDALConfigManager, get_cache_dir
 
 DEM_GEOJSON = '/vsicurl/https://asf-dem-west.s3.amazonaws.com/v2/cop30-2021-with-cop90-us-west-2-mirror.geojson'
+DEM_INDEX_VERSION = 1
+METERS_PER_DEGREE = 111320.0
+EGM2008_GEOID = '$DIFF_HOME/scripts/egm2008-5.dem'
+EGM2008_GEOID_PAR = '$DIFF_HOME/scripts/egm2008-5.dem_par'
 
+log = logging.getLogger(__name__)
 gdal.UseExceptions()
 ogr.UseExceptions()
 
 
 def get_geometry_from_kml(kml_file: str) -> ogr.Geometry:
-    cmd = ['ogr2ogr', '-wrapdateline', '-datelineoffset', '20', '-f', 'GeoJSON', '-mapfieldtype', 'DateTime=String',
-           '/vsistdout', kml_file]
-    geojson_str = run(cmd, stdout=PIPE, check=True).stdout
-    geometry = json.loads(geojson_str)['features'][0]['geometry']
-    return ogr.CreateGeometryFromJson(json.dumps(geometry))
+    """Get the footprint from a Sentinel-1 preview `map-overlay.kml`, split on the antimeridian if it crosses it"""
+    root = etree.parse(str(kml_file)).getroot()
+    coordinates = root.find('.//{*}LatLonQuad/{*}coordinates').text.split()
+    points = [tuple(float(value) for value in coordinate.split(',')[:2]) for coordinate in coordinates]
+    footprint = antimeridian.wrap_dateline(Polygon(points))
+    return ogr.CreateGeometryFromWkb(footprint.wkb)
 
 
 def get_dem_features() -> Generator[ogr.Feature, None, None]:
@@ -31,17 +51,182 @@ def get_dem_features() -> Generator[ogr.Feature, None, None]:
     del ds
 
 
+def get_bounding_box(geometry: ogr.Geometry) -> Tuple[float, float, float, float]:
+    min_x, max_x, min_y, max_y = geometry.GetEnvelope()
+    return min_x, min_y, max_x, max_y
+
+
+class DemTileIndex:
+    """Array-backed index of the DEM tiles in `DEM_GEOJSON`
+
+    The index holds each tile's bounding box, file path, and WKB geometry in NumPy arrays, in `DEM_GEOJSON` order, and
+    is stored as a versioned, compressed `.npz` file that loads in milliseconds without any network requests.
+    """
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Path to an index file written by `DemTileIndex.build`
+        """
+        with np.load(path, allow_pickle=False) as index_file:
+            if int(index_file['version']) != DEM_INDEX_VERSION or str(index_file['catalog']) != DEM_GEOJSON:
+                raise ValueError(f'{path} is not a version {DEM_INDEX_VERSION} index of {DEM_GEOJSON}')
+            self.bounds = index_file['bounds']
+            self.file_paths = index_file['file_paths']
+            self.wkb = index_file['wkb']
+            self.wkb_offsets = index_file['wkb_offsets']
+
+    @staticmethod
+    def build(path: Path):
+        """Build an index file of the tiles in `DEM_GEOJSON`
+
+        Args:
+            path: Path for the new index file
+        """
+        bounds = []
+        file_paths = []
+        wkbs = []
+        for feature in get_dem_features():
+            geometry = feature.GetGeometryRef()
+            bounds.append(get_bounding_box(geometry))
+            file_paths.append(feature.GetField('file_path'))
+            wkbs.append(bytes(geometry.ExportToWkb()))
+
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                version=np.array(DEM_INDEX_VERSION),
+                catalog=np.array(DEM_GEOJSON),
+                bounds=np.array(bounds, dtype=np.float64).reshape(-1, 4),
+                file_paths=np.array(file_paths, dtype=np.bytes_),
+                wkb=np.frombuffer(b''.join(wkbs), dtype=np.uint8),
+                wkb_offsets=np.cumsum([0] + [len(wkb) for wkb in wkbs], dtype=np.int64),
+            )
+
+    def query(self, geometry: ogr.Geometry) -> List[str]:
+        """Get the file paths of the tiles intersecting a geometry, in `DEM_GEOJSON` order"""
+        if geometry.GetGeometryName().startswith('MULTI'):
+            parts = [geometry.GetGeometryRef(i) for i in range(geometry.GetGeometryCount())]
+        else:
+            parts = [geometry]
+
+        candidates = np.zeros(len(self.bounds), dtype=bool)
+        for part in parts:
+            min_x, min_y, max_x, max_y = get_bounding_box(part)
+            candidates |= ((self.bounds[:, 0] <= max_x) & (self.bounds[:, 2] >= min_x)
+                           & (self.bounds[:, 1] <= max_y) & (self.bounds[:, 3] >= min_y))
+
+        file_paths = []
+        for tile_id in np.flatnonzero(candidates):
+            wkb = self.wkb[self.wkb_offsets[tile_id]:self.wkb_offsets[tile_id + 1]].tobytes()
+            if ogr.CreateGeometryFromWkb(wkb).Intersects(geometry):
+                file_paths.append(self.file_paths[tile_id].decode())
+        return file_paths
+
+
+def get_dem_index_name() -> str:
+    return f'{Path(DEM_GEOJSON).stem}.v{DEM_INDEX_VERSION}.npz'
+
+
+def build_dem_index(path: Path):
+    """Build an index of `DEM_GEOJSON` at a path, replacing any existing index atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with TemporaryDirectory(prefix=f'.{path.name}-', dir=path.parent) as temp_dir:
+        temp_path = Path(temp_dir) / path.name
+        DemTileIndex.build(temp_path)
+        os.replace(temp_path, path)
+
+
+@lru_cache(maxsize=None)
+def get_dem_index() -> DemTileIndex:
+    """Get the index of `DEM_GEOJSON`
+
+    The index is loaded from the local cache directory if present, else from the index packaged with `hyp3_gamma`,
+    else it is built in the local cache directory and reused by later jobs. Refresh the index with the
+    `refresh_dem_index` command.
+    """
+    index_path = get_cache_dir() / 'dem_index' / get_dem_index_name()
+    if index_path.exists():
+        return DemTileIndex(index_path)
+
+    packaged_index_path = Path(__file__).parent / 'data' / get_dem_index_name()
+    if packaged_index_path.exists():
+        return DemTileIndex(packaged_index_path)
+
+    log.info(f'Building DEM tile index for {DEM_GEOJSON} in {index_path}')
+    build_dem_index(index_path)
+    return DemTileIndex(index_path)
+
+
+def refresh_dem_index():
+    """Entrypoint to rebuild the DEM tile index from `DEM_GEOJSON`"""
+    parser = ArgumentParser(description=refresh_dem_index.__doc__, formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--output', type=Path, default=get_cache_dir() / 'dem_index' / get_dem_index_name(),
+                        help='Path for the index; use hyp3_gamma/data/ to refresh the packaged index')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.INFO)
+
+    log.info(f'Building DEM tile index for {DEM_GEOJSON} in {args.output}')
+    build_dem_index(args.output)
+    get_dem_index.cache_clear()
+
+
 def intersects_dem(geometry: ogr.Geometry) -> bool:
-    for feature in get_dem_features():
-        if feature.GetGeometryRef().Intersects(geometry):
-            return True
+    return len(get_dem_index().query(geometry)) > 0
+
+
+def get_dem_tile_cache() -> Optional[FileCache]:
+    """Get the local DEM tile cache, if enabled
+
+    The cache is enabled by setting the `HYP3_GAMMA_DEM_TILE_CACHE_BYTES` environment variable to the maximum total
+    size of the cached tiles, in bytes.
+    """
+    max_bytes = int(os.getenv('HYP3_GAMMA_DEM_TILE_CACHE_BYTES', '0'))
+    if max_bytes <= 0:
+        return None
+    return FileCache(get_cache_dir() / 'dem_tiles', max_bytes)
+
+
+def get_tile_cache_key(file_path: str) -> str:
+    return urlparse(file_path.removeprefix('/vsicurl/')).path.lstrip('/')
 
 
 def get_dem_file_paths(geometry: ogr.Geometry) -> List[str]:
+    file_paths = get_dem_index().query(geometry)
+
+    tile_cache = get_dem_tile_cache()
+    if tile_cache:
+        cached_paths = [tile_cache.get(get_tile_cache_key(file_path)) for file_path in file_paths]
+        file_paths = [str(cached) if cached else file_path for cached, file_path in zip(cached_paths, file_paths)]
+
+    return file_paths
+
+
+def cache_dem_tiles(dem_file_paths: List[str]) -> List[str]:
+    """Download DEM tiles that are not yet in the local DEM tile cache
+
+    Args:
+        dem_file_paths: DEM tile paths as returned by `get_dem_file_paths`
+
+    Returns:
+        file_paths: Local paths to the cached DEM tiles, or `dem_file_paths` if the cache is not enabled
+    """
+    tile_cache = get_dem_tile_cache()
+    if not tile_cache:
+        return dem_file_paths
+
     file_paths = []
-    for feature in get_dem_features():
-        if feature.GetGeometryRef().Intersects(geometry):
-            file_paths.append(feature.GetField('file_path'))
+    for file_path in dem_file_paths:
+        if file_path.startswith('/vsicurl/'):
+            key = get_tile_cache_key(file_path)
+            cached = tile_cache.get(key)
+            if cached is None:
+                with tile_cache.temporary_directory() as temp_dir:
+                    download_path = download_file(file_path.removeprefix('/vsicurl/'), temp_dir, chunk_size=10485760)
+                    cached = tile_cache.put(key, Path(download_path))
+            file_path = str(cached)
+        file_paths.append(file_path)
     return file_paths
 
 
@@ -62,22 +247,266 @@ def get_centroid_crossing_antimeridian(geometry: ogr.Geometry) -> ogr.Geometry:
 
 
 def shift_for_antimeridian(dem_file_paths: List[str], directory: Path) -> List[str]:
-    shifted_file_paths = []
-    for file_path in dem_file_paths:
-        if '_W' in file_path:
-            shifted_file_path = str(directory / Path(file_path).with_suffix('.vrt').name)
-            corners = gdal.Info(file_path, format='json')['cornerCoordinates']
-            output_bounds = [
-                corners['upperLeft'][0] + 360,
-                corners['upperLeft'][1],
-                corners['lowerRight'][0] + 360,
-                corners['lowerRight'][1]
-            ]
-            gdal.Translate(shifted_file_path, file_path, format='VRT', outputBounds=output_bounds)
-            shifted_file_paths.append(shifted_file_path)
+    """Shift the DEM tiles west of the antimeridian 360 degrees east so they can be mosaicked with the eastern tiles
+
+    The western tiles are mosaicked into a single VRT and its geotransform is shifted, so no tile is opened more than
+    once and no per-tile corner coordinates are needed.
+
+    Building the VRT opens the western tiles, over `/vsicurl/` unless they are in the local DEM tile cache. This can't
+    be avoided with `DemTileIndex.bounds`: the index holds the tile footprints, not the raster size, data type, no-data
+    value, or half-pixel offset the VRT needs, and the width of Copernicus tiles varies with latitude. The header ranges
+    read here stay in GDAL's `/vsicurl/` cache for when the mosaic is built.
+
+    Args:
+        dem_file_paths: Paths to the DEM tiles
+        directory: Directory to write the shifted VRT to
+
+    Returns:
+        shifted_file_paths: Path to the shifted VRT of the western tiles, followed by the paths to the eastern tiles
+    """
+    west_file_paths = [file_path for file_path in dem_file_paths if '_W' in Path(file_path).name]
+    east_file_paths = [file_path for file_path in dem_file_paths if '_W' not in Path(file_path).name]
+    if not west_file_paths:
+        return east_file_paths
+
+    shifted_file_path = str(directory / 'antimeridian_west.vrt')
+    shifted_ds = gdal.BuildVRT(shifted_file_path, west_file_paths, resolution='highest')
+    geotransform = list(shifted_ds.GetGeoTransform())
+    geotransform[0] += 360
+    shifted_ds.SetGeoTransform(geotransform)
+    del shifted_ds
+
+    return [shifted_file_path] + east_file_paths
+
+
+def get_dem_mosaic_cache() -> Optional[FileCache]:
+    """Get the local cache of warped DEM mosaics, if enabled
+
+    The cache is enabled by setting the `HYP3_GAMMA_DEM_MOSAIC_CACHE_BYTES` environment variable to the maximum total
+    size of the cached mosaics, in bytes.
+    """
+    max_bytes = int(os.getenv('HYP3_GAMMA_DEM_MOSAIC_CACHE_BYTES', '0'))
+    if max_bytes <= 0:
+        return None
+    return FileCache(get_cache_dir() / 'dem_mosaics', max_bytes)
+
+
+def get_snapped_bounds(geometry: ogr.Geometry) -> Tuple[int, int, int, int]:
+    min_x, min_y, max_x, max_y = get_bounding_box(geometry)
+    return math.floor(min_x), math.floor(min_y), math.ceil(max_x), math.ceil(max_y)
+
+
+def get_cached_dem_mosaic(mosaic_cache: FileCache, geometry: ogr.Geometry, epsg_code: int, pixel_size: float) -> Path:
+    """Get a cached DEM mosaic covering a geometry, warping and caching a new mosaic if none covers it
+
+    New mosaics cover the geometry's bounding box snapped outward to whole degrees, so repeat-pass acquisitions of the
+    same frame share one mosaic. The smallest cached mosaic whose snapped bounding box contains this geometry's is used.
+
+    Args:
+        mosaic_cache: Cache of DEM mosaics
+        geometry: Geometry in EPSG:4326 (lon/lat) projection for which to get a DEM mosaic
+        epsg_code: EPSG code of the UTM projection of the mosaic
+        pixel_size: Pixel size of the mosaic in meters
+
+    Returns:
+        mosaic: Path to the cached DEM mosaic GeoTIFF
+    """
+    min_lon, min_lat, max_lon, max_lat = get_snapped_bounds(geometry)
+    mosaic_dir = f'{Path(DEM_GEOJSON).stem}/EPSG{epsg_code}/{pixel_size:g}m'
+
+    candidates = []
+    for path in (mosaic_cache.directory / mosaic_dir).glob('*.tif'):
+        west, south, east, north = [int(bound) for bound in path.stem.split('_')]
+        if west <= min_lon and south <= min_lat and east >= max_lon and north >= max_lat:
+            candidates.append(((east - west) * (north - south), path.name))
+    for _, name in sorted(candidates):
+        mosaic = mosaic_cache.get(f'{mosaic_dir}/{name}')
+        if mosaic is not None:
+            log.info(f'Using cached DEM mosaic {mosaic}')
+            return mosaic
+
+    # shrink the snapped bounding box slightly so tiles only touching its edges are not included
+    snapped_box = ogr.CreateGeometryFromWkt(
+        f'POLYGON (({min_lon} {min_lat}, {max_lon} {min_lat}, {max_lon} {max_lat}, {min_lon} {max_lat}, '
+        f'{min_lon} {min_lat}))'
+    ).Buffer(-1e-6)
+    key = f'{mosaic_dir}/{min_lon}_{min_lat}_{max_lon}_{max_lat}.tif'
+    log.info(f'Caching new DEM mosaic {key}')
+    with mosaic_cache.temporary_directory() as temp_dir:
+        mosaic = temp_dir / 'mosaic.tif'
+        warp_dem_mosaic(str(mosaic), snapped_box, epsg_code, pixel_size, temp_dir)
+        return mosaic_cache.put(key, mosaic)
+
+
+def crop_dem_mosaic(mosaic: Path, output_name: str, geometry: ogr.Geometry, epsg_code: int, pixel_size: float,
+                    gdal_format: str = 'GTiff'):
+    """Crop a DEM mosaic to the pixel-aligned UTM bounding box of a geometry, without resampling"""
+    lon_lat_srs = osr.SpatialReference()
+    lon_lat_srs.ImportFromEPSG(4326)
+    utm_srs = osr.SpatialReference()
+    utm_srs.ImportFromEPSG(epsg_code)
+    for srs in (lon_lat_srs, utm_srs):
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    utm_geometry = geometry.Clone()
+    utm_geometry.Segmentize(0.01)
+    utm_geometry.Transform(osr.CoordinateTransformation(lon_lat_srs, utm_srs))
+    min_x, min_y, max_x, max_y = get_bounding_box(utm_geometry)
+
+    projection_window = [
+        math.floor(min_x / pixel_size) * pixel_size,
+        math.ceil(max_y / pixel_size) * pixel_size,
+        math.ceil(max_x / pixel_size) * pixel_size,
+        math.floor(min_y / pixel_size) * pixel_size,
+    ]
+    gdal.Translate(output_name, str(mosaic), format=gdal_format, projWin=projection_window)
+
+
+def get_dem_warp_processes() -> int:
+    """Get the number of processes to warp DEM mosaics with
+
+    Set the `HYP3_GAMMA_DEM_WARP_PROCESSES` environment variable to more than one to warp DEM mosaics in windows with
+    a pool of processes (see `warp_in_windows`) instead of a single multithreaded `gdal.Warp`.
+    """
+    return int(os.getenv('HYP3_GAMMA_DEM_WARP_PROCESSES', '1'))
+
+
+def _warp_window(output_name: str, source: str, config_options: dict, warp_options: dict):
+    with GDALConfigManager(**config_options):
+        gdal.Warp(output_name, source, **warp_options)
+
+
+def warp_in_windows(output_name: str, source: str, processes: int, warp_memory_limit: int = 512, **warp_options):
+    """Warp a dataset by splitting the output grid into row windows that are warped in a pool of processes
+
+    The output grid is the one `gdal.Warp(output_name, source, **warp_options)` would create. Windows are warped with
+    an exact transformer (`errorThreshold=0`), so each output pixel depends only on its position in the output grid
+    and the assembled output is bit-identical to a single `gdal.Warp` with `errorThreshold=0`, for any number of
+    windows or processes.
+
+    Args:
+        output_name: Path for the output GeoTIFF
+        source: Path to the dataset to warp
+        processes: Number of processes to warp windows with
+        warp_memory_limit: Total memory in MB the warpers may use for caching, divided evenly between the processes
+        **warp_options: `gdal.Warp` keyword arguments describing the output grid and resampling
+    """
+    grid = gdal.Warp('', source, format='VRT', **warp_options)
+    geotransform = grid.GetGeoTransform()
+    width, height = grid.RasterXSize, grid.RasterYSize
+    del grid
+
+    window_options = {key: value for key, value in warp_options.items()
+                      if key not in ('xRes', 'yRes', 'targetAlignedPixels', 'multithread')}
+    window_options.update(errorThreshold=0, warpMemoryLimit=max(warp_memory_limit // processes, 1))
+
+    config_options = {'GDAL_DISABLE_READDIR_ON_OPEN': gdal.GetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN')}
+
+    window_height = math.ceil(height / (processes * 2))
+    with TemporaryDirectory() as temp_dir:
+        windows = []
+        arguments = []
+        for window_start in range(0, height, window_height):
+            window_end = min(window_start + window_height, height)
+            window = f'{temp_dir}/window_{window_start}.tif'
+            options = dict(
+                window_options,
+                outputBounds=[
+                    geotransform[0],
+                    geotransform[3] + window_end * geotransform[5],
+                    geotransform[0] + width * geotransform[1],
+                    geotransform[3] + window_start * geotransform[5],
+                ],
+                width=width,
+                height=window_end - window_start,
+            )
+            windows.append(window)
+            arguments.append((window, source, config_options, options))
+
+        # spawn rather than fork, which could inherit GDAL's or a background thread's locks while they are held
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+            list(executor.map(_warp_window, *zip(*arguments)))
+
+        mosaic_vrt = f'{temp_dir}/windows.vrt'
+        gdal.BuildVRT(mosaic_vrt, windows)
+        gdal.Translate(output_name, mosaic_vrt)
+
+
+def get_overview_factor(dem_vrt: gdal.Dataset, pixel_size: float) -> int:
+    """Get the factor by which to reduce the resolution of a lon/lat DEM mosaic before warping it to a pixel size
+
+    The factor is the largest power of two that keeps the mosaic's latitude spacing no coarser than `pixel_size`.
+    Reading a mosaic of Cloud Optimized GeoTIFF tiles at a reduced resolution reads the tiles' overviews instead of
+    their full resolution data.
+    """
+    y_res_meters = abs(dem_vrt.GetGeoTransform()[5]) * METERS_PER_DEGREE
+    ratio = pixel_size / y_res_meters
+    if ratio < 2:
+        return 1
+    return 2 ** int(math.log2(ratio))
+
+
+def warp_dem_mosaic(output_name: str, geometry: ogr.Geometry, epsg_code: int, pixel_size: float, directory: Path,
+                    crosses_antimeridian: bool = False, gdal_format: str = 'GTiff'):
+    """Warp the DEM tiles intersecting a geometry to a UTM mosaic
+
+    Intermediate files are written to `directory`, which must outlive the output when `gdal_format` is `VRT`. A `VRT`
+    output is a warped VRT that is resampled as it is read.
+    """
+    dem_file_paths = cache_dem_tiles(get_dem_file_paths(geometry))
+
+    if crosses_antimeridian:
+        dem_file_paths = shift_for_antimeridian(dem_file_paths, directory)
+
+    dem_vrt = directory / 'dem.vrt'
+    vrt = gdal.BuildVRT(str(dem_vrt), dem_file_paths)
+    overview_factor = get_overview_factor(vrt, pixel_size)
+    if overview_factor > 1:
+        _, x_res, _, _, _, y_res = vrt.GetGeoTransform()
+        log.info(f'Reading DEM tiles at {overview_factor}x their resolution for {pixel_size:g}m pixels')
+        vrt = gdal.BuildVRT(str(dem_vrt), dem_file_paths, resolution='user', xRes=x_res * overview_factor,
+                            yRes=abs(y_res) * overview_factor, resampleAlg='average')
+    del vrt
+
+    # an exact transformer, as in warp_in_windows, so the mosaic does not depend on the number of processes
+    warp_options = dict(dstSRS=f'EPSG:{epsg_code}', xRes=pixel_size, yRes=pixel_size, targetAlignedPixels=True,
+                        resampleAlg='cubic', errorThreshold=0)
+    processes = get_dem_warp_processes()
+    if processes > 1:
+        if gdal_format == 'VRT':
+            warped = directory / 'warped.tif'
+            warp_in_windows(str(warped), str(dem_vrt), processes, **warp_options)
+            gdal.Translate(output_name, str(warped), format='VRT')
         else:
-            shifted_file_paths.append(file_path)
-    return shifted_file_paths
+            warp_in_windows(output_name, str(dem_vrt), processes, **warp_options)
+    else:
+        gdal.Warp(output_name, str(dem_vrt), format=gdal_format, multithread=True, **warp_options)
+
+
+def prepare_dem_mosaic(output_name: str, geometry: ogr.Geometry, pixel_size: float, directory: Path,
+                       gdal_format: str = 'GTiff'):
+    """Create a DEM mosaic covering a given geometry; see `prepare_dem_geotiff`
+
+    Intermediate files are written to `directory`, which must outlive the output when `gdal_format` is `VRT`.
+    """
+    with GDALConfigManager(GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'):
+        if not intersects_dem(geometry):
+            raise DemError(f'Copernicus GLO-30 Public DEM does not intersect this geometry: {geometry}')
+
+        crosses_antimeridian = geometry.GetGeometryName() == 'MULTIPOLYGON'
+        if crosses_antimeridian:
+            centroid = get_centroid_crossing_antimeridian(geometry)
+        else:
+            centroid = geometry.Centroid()
+        epsg_code = utm_from_lon_lat(centroid.GetX(), centroid.GetY())
+
+        mosaic_cache = get_dem_mosaic_cache()
+        if mosaic_cache is not None and not crosses_antimeridian:
+            mosaic = get_cached_dem_mosaic(mosaic_cache, geometry.Buffer(0.15), epsg_code, pixel_size)
+            crop_dem_mosaic(mosaic, output_name, geometry.Buffer(0.15), epsg_code, pixel_size, gdal_format)
+        else:
+            warp_dem_mosaic(output_name, geometry.Buffer(0.15), epsg_code, pixel_size, directory,
+                            crosses_antimeridian, gdal_format)
 
 
 def prepare_dem_geotiff(output_name: str, geometry: ogr.Geometry, pixel_size: float = 30.0):
@@ -86,29 +515,215 @@ def prepare_dem_geotiff(output_name: str, geometry: ogr.Geometry, pixel_size: fl
     The DEM mosaic is assembled from the Copernicus GLO-30 Public DEM. The output GeoTIFF covers the input geometry
     buffered by 0.15 degrees, is projected to the UTM zone of the geometry centroid, and has a pixel size of 30m.
 
+    When the DEM mosaic cache is enabled (see `get_dem_mosaic_cache`), the output GeoTIFF is cropped from a cached
+    mosaic to the bounding box of the buffered geometry. Geometries crossing the antimeridian are not cached.
+
     Args:
         output_name: Path for the output GeoTIFF
         geometry: Geometry in EPSG:4326 (lon/lat) projection for which to prepare a DEM mosaic
         pixel_size: Pixel size for the output GeoTIFF in meters
 
     """
-    with GDALConfigManager(GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'):
-        if not intersects_dem(geometry):
-            raise DemError(f'Copernicus GLO-30 Public DEM does not intersect this geometry: {geometry}')
+    with TemporaryDirectory() as temp_dir:
+        prepare_dem_mosaic(output_name, geometry, pixel_size, Path(temp_dir))
 
-        with TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            centroid = geometry.Centroid()
-            dem_file_paths = get_dem_file_paths(geometry.Buffer(0.15))
 
-            if geometry.GetGeometryName() == 'MULTIPOLYGON':
-                centroid = get_centroid_crossing_antimeridian(geometry)
+def interpolate_geoid(geoid: np.ndarray, geoid_par: dict, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """Bilinearly interpolate geoid undulations from a global GAMMA EQA geoid model at lon/lat points"""
+    width, nlines = int(geoid_par['width']), int(geoid_par['nlines'])
+    post_lon, post_lat = float(geoid_par['post_lon']), float(geoid_par['post_lat'])
+
+    col = ((lon - float(geoid_par['corner_lon'])) % 360) / post_lon
+    row = np.clip((lat - float(geoid_par['corner_lat'])) / post_lat, 0, nlines - 1)
+
+    row0 = np.minimum(np.floor(row).astype(int), nlines - 2)
+    row_weight = row - row0
+    if math.isclose(width * post_lon, 360):
+        col0 = np.floor(col).astype(int) % width
+        col1 = (col0 + 1) % width
+    else:
+        col = np.clip(col, 0, width - 1)
+        col0 = np.minimum(np.floor(col).astype(int), width - 2)
+        col1 = col0 + 1
+    col_weight = col - np.floor(col)
+
+    top = geoid[row0, col0] * (1 - col_weight) + geoid[row0, col1] * col_weight
+    bottom = geoid[row0 + 1, col0] * (1 - col_weight) + geoid[row0 + 1, col1] * col_weight
+    undulation = top * (1 - row_weight) + bottom * row_weight
+    return float(geoid_par.get('DEM_hgt_offset', 0)) + float(geoid_par.get('DEM_scale', 1)) * undulation
+
+
+def write_gamma_dem_par(dem_par: str, title: str, width: int, nlines: int, corner_north: float, corner_east: float,
+                        post_north: float, post_east: float, utm_zone: int):
+    """Write a GAMMA DEM parameter file for a REAL*4 DEM in a WGS84 UTM projection
+
+    Args:
+        utm_zone: UTM zone number, negative for the southern hemisphere
+    """
+    false_northing = 10000000.0 if utm_zone < 0 else 0.0
+    center_longitude = abs(utm_zone) * 6 - 183
+    with open(dem_par, 'w') as f:
+        f.write(f"""Gamma DIFF&GEO DEM/MAP parameter file
+title:\t{title}
+DEM_projection:     UTM
+data_format:        REAL*4
+DEM_hgt_offset:          0.00000
+DEM_scale:               1.00000
+width:                {width:6d}
+nlines:               {nlines:6d}
+corner_north:  {corner_north:14.3f}   m
+corner_east:   {corner_east:14.3f}   m
+post_north:    {post_north:12.5e}   m
+post_east:     {post_east:12.5e}   m
+
+ellipsoid_name: WGS 84
+ellipsoid_ra:        6378137.000   m
+ellipsoid_reciprocal_flattening:  298.2572236
+
+datum_name: WGS 1984
+datum_shift_dx:              0.000   m
+datum_shift_dy:              0.000   m
+datum_shift_dz:              0.000   m
+datum_scale_m:         0.00000e+00
+datum_rotation_alpha:  0.00000e+00   arc-sec
+datum_rotation_beta:   0.00000e+00   arc-sec
+datum_rotation_gamma:  0.00000e+00   arc-sec
+datum_country_list: Global Definition, WGS84, World
+
+projection_name: UTM
+projection_zone:      {abs(utm_zone):13d}
+false_easting:        {500000.0:13.3f}   m
+false_northing:       {false_northing:13.3f}   m
+projection_k0:        {0.9996:13.7f}
+center_longitude:     {center_longitude:13.7f}   decimal degrees
+center_latitude:      {0.0:13.7f}   decimal degrees
+
+""")
 
-                dem_file_paths = shift_for_antimeridian(dem_file_paths, temp_path)
 
-            dem_vrt = temp_path / 'dem.vrt'
-            gdal.BuildVRT(str(dem_vrt), dem_file_paths)
+def get_gamma_dem_grid(dem_par: str) -> Tuple[int, int, Tuple[float, ...], osr.SpatialReference]:
+    """Get the raster grid described by a GAMMA DEM parameter file, without reading the DEM
+
+    GAMMA DEM corners are the centers of the upper left pixels, so the returned geotransform is shifted half a pixel
+    to the upper left corner of the upper left pixel, matching a GeoTIFF written by GAMMA's `data2geotiff` and opened
+    by GDAL.
+
+    Args:
+        dem_par: Path to a GAMMA DEM parameter file for a DEM in a WGS84 UTM or EQA (lon/lat) projection
+
+    Returns:
+        width: Number of pixels per line
+        nlines: Number of lines
+        geotransform: GDAL geotransform of the grid
+        srs: Spatial reference of the grid
+    """
+    parameters = read_gamma_par(dem_par)
+    srs = osr.SpatialReference()
+    if parameters['DEM_projection'] == 'UTM':
+        corner_x, corner_y = float(parameters['corner_east']), float(parameters['corner_north'])
+        post_x, post_y = float(parameters['post_east']), float(parameters['post_north'])
+        is_southern = float(parameters['false_northing']) == 10000000.0
+        srs.ImportFromEPSG((32700 if is_southern else 32600) + int(parameters['projection_zone']))
+    elif parameters['DEM_projection'] == 'EQA':
+        corner_x, corner_y = float(parameters['corner_lon']), float(parameters['corner_lat'])
+        post_x, post_y = float(parameters['post_lon']), float(parameters['post_lat'])
+        srs.ImportFromEPSG(4326)
+    else:
+        raise DemError(f'Unsupported DEM projection {parameters["DEM_projection"]} in {dem_par}')
 
-            epsg_code = utm_from_lon_lat(centroid.GetX(), centroid.GetY())
-            gdal.Warp(output_name, str(dem_vrt), dstSRS=f'EPSG:{epsg_code}', xRes=pixel_size, yRes=pixel_size,
-                      targetAlignedPixels=True, resampleAlg='cubic', multithread=True)
+    geotransform = (corner_x - post_x / 2, post_x, 0.0, corner_y - post_y / 2, 0.0, post_y)
+    return int(parameters['width']), int(parameters['nlines']), geotransform, srs
+
+
+def write_gamma_dem(dem_file: str, dem_image: str, dem_par: str, geoid: str = EGM2008_GEOID,
+                    geoid_par: str = EGM2008_GEOID_PAR, block_lines: int = 512, geoid_step: int = 16):
+    """Write a UTM DEM as a GAMMA DEM with ellipsoid heights, in a single pass over the DEM
+
+    Blocks of `block_lines` lines are read from the input DEM, converted from heights above the geoid to heights above
+    the WGS84 ellipsoid by adding the geoid undulation, and appended to the big-endian REAL*4 output DEM. Undulations
+    are interpolated from the geoid model at every `geoid_step` pixels, then bilinearly between those; the geoid is
+    smooth enough at DEM pixel sizes that this is indistinguishable from interpolating every pixel. Input no-data
+    pixels are written as 0, GAMMA's no-data value; input values of 0 are valid.
+
+    Args:
+        dem_file: Path to a GDAL dataset of orthometric heights in a WGS84 UTM projection, e.g. from
+            `prepare_dem_mosaic`
+        dem_image: Path for the output GAMMA DEM
+        dem_par: Path for the output GAMMA DEM parameter file
+        geoid: Path to the GAMMA EQA geoid model; environment variables are expanded
+        geoid_par: Path to the geoid model's parameter file; environment variables are expanded
+        block_lines: Number of lines to read and write at a time
+        geoid_step: Spacing in pixels of the undulations interpolated from the geoid model
+    """
+    geoid_parameters = read_gamma_par(os.path.expandvars(geoid_par))
+    geoid_data = open_raster(os.path.expandvars(geoid), os.path.expandvars(geoid_par))
+
+    ds = gdal.Open(dem_file)
+    band = ds.GetRasterBand(1)
+    nodata = band.GetNoDataValue()
+    width, height = ds.RasterXSize, ds.RasterYSize
+    geotransform = ds.GetGeoTransform()
+    corner_east, corner_north = geotransform[0], geotransform[3]
+    if ds.GetMetadataItem('AREA_OR_POINT') != 'Point':
+        corner_east += geotransform[1] / 2
+        corner_north += geotransform[5] / 2
+
+    utm_srs = ds.GetSpatialRef()
+    lon_lat_srs = osr.SpatialReference()
+    lon_lat_srs.ImportFromEPSG(4326)
+    for srs in (utm_srs, lon_lat_srs):
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    utm_zone = utm_srs.GetUTMZone()
+    if utm_zone == 0:
+        raise DemError(f'{dem_file} is not in a UTM projection')
+
+    geoid_cols = np.unique(np.append(np.arange(0, width, geoid_step), width - 1))
+    geoid_rows = np.unique(np.append(np.arange(0, height, geoid_step), height - 1))
+    x, y = np.meshgrid(corner_east + geoid_cols * geotransform[1], corner_north + geoid_rows * geotransform[5])
+    transformation = osr.CoordinateTransformation(utm_srs, lon_lat_srs)
+    points = transformation.TransformPoints(np.column_stack([x.ravel(), y.ravel()]).tolist())
+    lon, lat = np.array(points)[:, :2].T
+    undulation = interpolate_geoid(geoid_data, geoid_parameters, lon, lat).reshape(x.shape)
+
+    columns = np.arange(width)
+    with open(dem_image, 'wb') as f:
+        for line in range(0, height, block_lines):
+            lines = np.arange(line, min(line + block_lines, height))
+            first = max(np.searchsorted(geoid_rows, lines[0], side='right') - 1, 0)
+            last = np.searchsorted(geoid_rows, lines[-1], side='left') + 1
+            block_undulation = np.array([np.interp(columns, geoid_cols, row) for row in undulation[first:last]])
+            position = np.interp(lines, geoid_rows[first:last], np.arange(last - first))
+            lower = np.minimum(np.floor(position).astype(int), max(last - first - 2, 0))
+            upper = np.minimum(lower + 1, last - first - 1)
+            weight = (position - lower)[:, np.newaxis]
+            block_undulation = block_undulation[lower] * (1 - weight) + block_undulation[upper] * weight
+
+            data = band.ReadAsArray(0, int(lines[0]), width, len(lines)).astype(np.float64)
+            heights = data + block_undulation
+            if nodata is not None:
+                heights[data == nodata] = 0
+            heights.astype('>f4').tofile(f)
+
+    write_gamma_dem_par(dem_par, Path(dem_file).name, width, height, corner_north, corner_east,
+                        geotransform[5], geotransform[1], utm_zone)
+    del ds
+
+
+def prepare_dem_gamma(dem_image: str, dem_par: str, geometry: ogr.Geometry, pixel_size: float = 30.0):
+    """Create a GAMMA DEM with ellipsoid heights covering a given geometry
+
+    Equivalent to `prepare_dem_geotiff` followed by GAMMA's `dem_import` with the EGM2008 geoid, but the DEM tiles are
+    warped as they are read and written straight to GAMMA format (see `write_gamma_dem`), without an intermediate
+    GeoTIFF.
+
+    Args:
+        dem_image: Path for the output GAMMA DEM
+        dem_par: Path for the output GAMMA DEM parameter file
+        geometry: Geometry in EPSG:4326 (lon/lat) projection for which to prepare a DEM
+        pixel_size: Pixel size for the output DEM in meters
+    """
+    with TemporaryDirectory() as temp_dir:
+        dem_vrt = str(Path(temp_dir) / 'dem_mosaic.vrt')
+        prepare_dem_mosaic(dem_vrt, geometry, pixel_size, Path(temp_dir), gdal_format='VRT')
+        with GDALConfigManager(GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'):
+            write_gamma_dem(dem_vrt, dem_image, dem_par)
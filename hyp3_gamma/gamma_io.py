@@ -0,0 +1,211 @@
+"""Access to GAMMA parameter files and memory-mapped binary rasters"""
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import Generator, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+FLOAT = np.dtype('>f4')
+FCOMPLEX = np.dtype('>c8')
+SCOMPLEX = np.dtype([('real', '>i2'), ('imag', '>i2')])
+SHORT = np.dtype('>i2')
+RASTER = np.dtype('u1')
+
+DTYPES = {
+    'FLOAT': FLOAT,
+    'REAL*4': FLOAT,
+    'FCOMPLEX': FCOMPLEX,
+    'SCOMPLEX': SCOMPLEX,
+    'SHORT': SHORT,
+    'INTEGER*2': SHORT,
+    'BYTE': RASTER,
+    'UCHAR': RASTER,
+}
+
+SHAPE_PARAMETERS = (
+    ('azimuth_lines', 'range_samples'),
+    ('nlines', 'width'),
+    ('interferogram_azimuth_lines', 'interferogram_width'),
+)
+
+
+class ParFile:
+    """Parsed GAMMA parameter file, e.g. an SLC/MLI, DEM, offset, or DIFF parameter file
+
+    Each `key: value units` line is parsed once; if a key is repeated, the last value wins. Use `read_par_file` to
+    share one parsed copy of a file between callers.
+    """
+    def __init__(self, par_file: Union[str, Path]):
+        """
+        Args:
+            par_file: Path to the GAMMA parameter file
+        """
+        self.path = Path(par_file)
+        self._values = {}
+        with open(self.path) as f:
+            for line in f:
+                key, separator, value = line.partition(':')
+                if separator and value.strip():
+                    self._values[key.strip()] = value.strip()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __getitem__(self, key: str) -> str:
+        """Get the full value text of a parameter, including any units, e.g. `46.591240   m`"""
+        try:
+            return self._values[key]
+        except KeyError:
+            raise KeyError(f'Parameter {key} not found in {self.path}') from None
+
+    def get(self, key: str, index: int = 0) -> str:
+        """Get one whitespace-separated value of a parameter, the first by default, without units"""
+        return self[key].split()[index]
+
+    def get_float(self, key: str, index: int = 0) -> float:
+        """Get one value of a parameter as a float; see `get`"""
+        return float(self.get(key, index))
+
+    def get_int(self, key: str, index: int = 0) -> int:
+        """Get one value of a parameter as an int; see `get`"""
+        return int(self.get(key, index))
+
+    def get_floats(self, key: str) -> List[float]:
+        """Get all the numeric values of a parameter, e.g. the coefficients of an offset polynomial"""
+        return [float(value) for value in self[key].split() if _is_number(value)]
+
+    def get_units(self, key: str) -> Optional[str]:
+        """Get the units of a numeric parameter, e.g. `m` or `degrees`, or None if it has none"""
+        values = self[key].split()
+        if not _is_number(values[0]) or _is_number(values[-1]):
+            return None
+        return ' '.join(value for value in values if not _is_number(value))
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=256)
+def _read_par_file(path: Path, mtime_ns: int, size: int) -> ParFile:
+    return ParFile(path)
+
+
+def read_par_file(par_file: Union[str, Path]) -> ParFile:
+    """Read a GAMMA parameter file, reusing the parsed copy if the file has not changed since it was last read
+
+    Parsed files are cached by absolute path, modification time, and size, so a parameter file rewritten by a GAMMA
+    program is parsed again. The returned `ParFile` is shared between callers and must not be modified.
+    """
+    path = Path(par_file).resolve()
+    stat = path.stat()
+    return _read_par_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+def read_gamma_par(par_file: Union[str, Path]) -> dict:
+    """Read the `key: value` entries of a GAMMA parameter file, without units"""
+    parameters = read_par_file(par_file)
+    return {key: parameters.get(key) for key in parameters}
+
+
+def get_raster_shape(par_file: Union[str, Path]) -> Tuple[int, int]:
+    """Get the (lines, samples) shape of the rasters described by a GAMMA SLC/MLI, DEM, or offset parameter file"""
+    parameters = read_par_file(par_file)
+    for lines_key, samples_key in SHAPE_PARAMETERS:
+        if lines_key in parameters and samples_key in parameters:
+            return parameters.get_int(lines_key), parameters.get_int(samples_key)
+    raise ValueError(f'Unable to determine the raster size from {par_file}')
+
+
+def get_raster_dtype(par_file: Union[str, Path]) -> np.dtype:
+    """Get the data type of the raster described by a GAMMA SLC/MLI or DEM parameter file"""
+    parameters = read_par_file(par_file)
+    data_format = next((parameters.get(key) for key in ('image_format', 'data_format') if key in parameters), None)
+    if data_format not in DTYPES:
+        raise ValueError(f'Unable to determine the data type from {par_file}')
+    return DTYPES[data_format]
+
+
+def open_raster(path: Union[str, Path], par_file: Optional[Union[str, Path]] = None,
+                shape: Optional[Tuple[int, int]] = None, dtype: Optional[Union[str, np.dtype]] = None,
+                mode: str = 'r') -> np.memmap:
+    """Memory map a GAMMA binary raster
+
+    GAMMA rasters are headerless and big-endian, so the returned array can be indexed like any NumPy array without
+    reading the whole file; `raster[line, sample]` reads one value and `raster[first:last]` reads those lines.
+
+    Args:
+        path: Path to the GAMMA raster
+        par_file: GAMMA parameter file to get the shape, and data type if `dtype` is not given, from
+        shape: (lines, samples) of the raster, instead of reading them from `par_file`
+        dtype: Data type of the raster, e.g. `FLOAT`, `FCOMPLEX`, or a `DTYPES` key; defaults to the type in `par_file`
+            or `FLOAT`
+        mode: Memory map mode; `r` for read only or `r+` for read and write
+
+    Returns:
+        raster: The memory-mapped raster
+    """
+    if shape is None:
+        if par_file is None:
+            raise ValueError('Either par_file or shape is required')
+        shape = get_raster_shape(par_file)
+    if dtype is None:
+        dtype = get_raster_dtype(par_file) if par_file is not None else FLOAT
+    dtype = DTYPES.get(dtype, dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=tuple(shape))
+
+
+def create_raster(path: Union[str, Path], shape: Tuple[int, int], dtype: Union[str, np.dtype] = FLOAT) -> np.memmap:
+    """Create a GAMMA binary raster of zeros, memory mapped for writing; see `open_raster`"""
+    return np.memmap(path, dtype=DTYPES.get(dtype, dtype), mode='w+', shape=tuple(shape))
+
+
+def open_bmp(path: Union[str, Path], mode: str = 'r') -> np.ndarray:
+    """Memory map the pixels of an uncompressed 8-bit BMP, such as the validity mask written by `rascc_mask`
+
+    The header and palette are left as they are, so a copy of a BMP can be modified in place with `mode='r+'`.
+
+    Args:
+        path: Path to the BMP
+        mode: Memory map mode; `r` for read only or `r+` for read and write
+
+    Returns:
+        pixels: View of the (lines, samples) palette indices of the memory-mapped BMP, first line first
+    """
+    with open(path, 'rb') as f:
+        header = f.read(34)
+    if len(header) < 34 or header[:2] != b'BM':
+        raise ValueError(f'{path} is not a BMP file')
+    offset, = struct.unpack_from('<I', header, 10)
+    width, height, _, bits_per_pixel, compression = struct.unpack_from('<iiHHI', header, 18)
+    if bits_per_pixel != 8 or compression != 0:
+        raise ValueError(f'{path} is not an uncompressed 8-bit BMP')
+
+    row_bytes = (width + 3) // 4 * 4
+    pixels = np.memmap(path, dtype=RASTER, mode=mode, offset=offset, shape=(abs(height), row_bytes))[:, :width]
+    # rows are stored last line first unless the height is negative
+    return pixels[::-1] if height > 0 else pixels
+
+
+def iter_blocks(raster: np.ndarray, block_lines: int = 1024) -> Generator[Tuple[slice, np.ndarray], None, None]:
+    """Iterate over blocks of lines of a raster, so only one block needs to be in memory at a time
+
+    Args:
+        raster: Raster to iterate over, e.g. from `open_raster`
+        block_lines: Number of lines per block
+
+    Yields:
+        lines: Slice of the lines in the block
+        block: View of the block
+    """
+    for line in range(0, raster.shape[0], block_lines):
+        lines = slice(line, min(line + block_lines, raster.shape[0]))
+        yield lines, raster[lines]
@@ -14,7 +14,6 @@ from secrets import token_hex
 from hyp3lib import GranuleError
 from hyp3lib.SLC_copy_S1_fullSW import SLC_copy_S1_fullSW
 from hyp3lib.execute import execute
-from hyp3lib.getParameter import getParameter
 from hyp3lib.get_orb import downloadSentinelOrbitFile
 from hyp3lib.makeAsfBrowse import makeAsfBrowse
 from hyp3lib.par_s1_slc_single import par_s1_slc_single
@@ -22,6 +21,7 @@ from hyp3lib.system import gamma_version
 from lxml import etree, objectify
 
 import hyp3_gamma
+from hyp3_gamma.gamma_io import read_par_file
 from hyp3_gamma.insar.getDemFileGamma import get_dem_file_gamma
 from hyp3_gamma.insar.interf_pwr_s1_lt_tops_proc import interf_pwr_s1_lt_tops_proc
 from hyp3_gamma.insar.unwrapping_geocoding import unwrapping_geocoding
@@ -245,18 +245,14 @@ def make_parameter_file(mydir, parameter_file_name, alooks, rlooks, dem_source,
     reference_file = glob.glob("*%s*.SAFE" % reference_date)[0]
     secondary_file = glob.glob("*%s*.SAFE" % secondary_date)[0]
 
-    parfile = f'{reference_date_short}.mli.par'
-    erad_nadir = getParameter(parfile, 'earth_radius_below_sensor')
-    erad_nadir = erad_nadir.split()[0]
-    sar_to_earth_center = getParameter(parfile, 'sar_to_earth_center')
-    sar_to_earth_center = sar_to_earth_center.split()[0]
+    parameters = read_par_file(f'{reference_date_short}.mli.par')
+    erad_nadir = parameters.get('earth_radius_below_sensor')
+    sar_to_earth_center = parameters.get('sar_to_earth_center')
     height = float(sar_to_earth_center) - float(erad_nadir)
-    near_slant_range = getParameter(parfile, 'near_range_slc')
-    near_slant_range = near_slant_range.split()[0]
-    center_slant_range = getParameter(parfile, 'center_range_slc')
-    center_slant_range = center_slant_range.split()[0]
-    far_slant_range = getParameter(parfile, 'far_range_slc')
-    far_slant_range = far_slant_range.split()[0]
+    near_slant_range = parameters.get('near_range_slc')
+    center_slant_range = parameters.get('center_range_slc')
+    far_slant_range = parameters.get('far_range_slc')
+    heading = parameters.get_float('heading')
 
     with open("baseline.log") as f:
         for line in f:
@@ -283,16 +279,6 @@ def make_parameter_file(mydir, parameter_file_name, alooks, rlooks, dem_source,
                 utctime = ((int(s[0]) * 60 + int(s[1])) * 60) + float(s[2])
     os.chdir(back)
 
-    heading = None
-    name = f'{reference_date[:8]}.mli.par'
-    with open(name, "r") as f:
-        for line in f:
-            if "heading" in line:
-                t = re.split(":", line)
-                # FIXME: RE is overly complicated here. this is two simple string splits
-                s = re.split(r'\s+', t[1])
-                heading = float(s[1])
-
     reference_orbit_parameters = get_orbit_parameters(reference_file)
     secondary_orbit_parameters = get_orbit_parameters(secondary_file)
 
@@ -424,8 +410,12 @@ def insar_sentinel_gamma(reference_file, secondary_file, rlooks=20, alooks=4, in
     # Perform phase unwrapping and geocoding of results
     log.info("Starting phase unwrapping and geocoding")
 
-    coords, ref_point_info = unwrapping_geocoding(reference, secondary, step="man", rlooks=rlooks, alooks=alooks,
-                                                  alpha=phase_filter_parameter, apply_water_mask=apply_water_mask)
+    coords, ref_point_info = unwrapping_geocoding(
+        reference, secondary, step="man", rlooks=rlooks, alooks=alooks, alpha=phase_filter_parameter,
+        apply_water_mask=apply_water_mask, include_look_vectors=include_look_vectors,
+        include_displacement_maps=include_displacement_maps, include_wrapped_phase=include_wrapped_phase,
+        include_inc_map=include_inc_map, include_dem=include_dem,
+    )
 
     # Generate metadata
     log.info("Collecting metadata and output files")
@@ -7,7 +7,8 @@ import shutil
 import sys
 
 from hyp3lib.execute import execute
-from hyp3lib.getParameter import getParameter
+
+from hyp3_gamma.gamma_io import read_par_file
 
 log = logging.getLogger(__name__)
 
@@ -65,7 +66,7 @@ def coregister_data(cnt, SLC2tab, SLC2Rtab, spar, mpar, mmli, smli, ifgname,
     execute(f"SLC_diff_intf {reference}.slc {secondary}.rslc {mpar} {srpar} {offi}"
             f" {ifgname}.sim_unw {ifgname}.diff0.{ifg_diff_sfx} {rlooks} {alooks} 0 0", uselogging=True)
 
-    width = getParameter(offi, "interferogram_width")
+    width = read_par_file(offi).get("interferogram_width")
     execute(f"rasmph_pwr {ifgname}.diff0.{ifg_diff_sfx} {reference}.mli {width} - - 3 3", uselogging=True)
 
     if cnt == 0:
@@ -5,21 +5,25 @@ import logging
 import os
 import shutil
 import subprocess
-from tempfile import TemporaryDirectory
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import scipy.ndimage
-from PIL import Image
 from hyp3lib.execute import execute
-from hyp3lib.getParameter import getParameter
 from osgeo import gdal
 
-from hyp3_gamma.water_mask import create_water_mask
+from hyp3_gamma import gamma_io
+from hyp3_gamma.water_mask import create_water_mask_from_gamma_par
 
 
 log = logging.getLogger(__name__)
 
+# states of SAR pixels while mapping the water mask to SAR space
+WATER = 0
+LAND = 1
+UNASSIGNED = 2
+FILLED = 3
+
 
 def get_ref_point_info(log_text: str):
     log_lines = log_text.splitlines()
@@ -37,7 +41,7 @@ def get_ref_point_info(log_text: str):
 def get_height_at_pixel(in_height_file: str, mlines: int, mwidth: int, ref_azlin: int, ref_rpix: int) -> float:
     """get the height of the pixel (ref_azlin, ref_rpix)
     """
-    height = read_bin(in_height_file, mlines, mwidth)
+    height = gamma_io.open_raster(in_height_file, shape=(mlines, mwidth))
 
     return height[ref_azlin, ref_rpix]
 
@@ -88,45 +92,129 @@ def get_coords(in_mli_par: str, ref_azlin: int = 0, ref_rpix: int = 0, height: f
 
 
 def read_bin(file, lines: int, samples: int):
-    data = np.fromfile(file, dtype='>f4')
-    values = np.reshape(data, (lines, samples))
-    return values
+    """memory map a GAMMA float binary file; see `gamma_io.open_raster`
+    """
+    return gamma_io.open_raster(file, shape=(lines, samples))
 
 
-def read_bmp(file):
-    im = Image.open(file)
-    data = np.asarray(im)
-    return data
+def get_pixel_weights(coherence: np.array, window_size=(5, 5), coherence_threshold=0.3) -> Tuple[np.array, np.array]:
+    """Sum coherence values in the window around each pixel, in a few passes of box-sum, min, and max filters
 
+    Pixels outside the array count as zero coherence. Windows with any coherence values less than the threshold or
+    equal to 1.0 have a weight of zero.
 
-def get_reference_pixel(coherence: np.array, window_size=(5, 5), coherence_threshold=0.3) -> Tuple[int, int]:
+    Args:
+        coherence: array of coherence values
+        window_size: window size over which to sum coherence values for each pixel
+        coherence_threshold: pixels with values less than the threshold in their window will not be considered
+
+    Returns:
+        pixel_weights: summed coherence values, to within rounding error
+        valid: whether each pixel's window has no coherence values less than the threshold or equal to 1.0
+    """
+    coherence = np.asarray(coherence, dtype=np.float64)
+    below_threshold = scipy.ndimage.minimum_filter(coherence, size=window_size, mode='constant',
+                                                   cval=0.0) < coherence_threshold
+    has_one = scipy.ndimage.maximum_filter(coherence == 1.0, size=window_size, mode='constant', cval=False)
+    valid = ~(below_threshold | has_one)
+
+    window_sums = coherence
+    for axis, size in enumerate(window_size):
+        window_sums = scipy.ndimage.correlate1d(window_sums, np.ones(size), axis=axis, mode='constant', cval=0.0)
+    return np.where(valid, window_sums, 0.0), valid
+
+
+def _find_max_weight(coherence: np.array, window_size, coherence_threshold, rows: slice, cols: slice,
+                     chunk_size: int = 65536):
+    # scipy.ndimage.generic_filter writes the window sums in the dtype of the coherence, so compare them in that dtype
+    dtype = np.asarray(coherence).dtype
+    pixel_weights, valid = get_pixel_weights(coherence, window_size, coherence_threshold)
+    pixel_weights, valid = pixel_weights[rows, cols], valid[rows, cols]
+
+    # Re-sum the windows whose weight is within rounding error of the maximum exactly as generic_filter would, one
+    # window per row with np.sum, so ties break the same way as scipy.ndimage.generic_filter + np.argmax
+    max_weight = pixel_weights.max()
+    resolution = np.finfo(dtype).eps if np.issubdtype(dtype, np.floating) else 1.0
+    tolerance = 2 * resolution * max(abs(max_weight), 1.0) + 1e-9 * np.prod(window_size)
+    is_candidate = valid & (pixel_weights >= max_weight - tolerance)
+    if not valid.all():
+        # the first zero weight, in case no valid window wins
+        is_candidate.flat[np.argmin(valid)] = True
+    candidate_rows, candidate_cols = np.nonzero(is_candidate)
+
+    before = [size // 2 for size in window_size]
+    padded = np.pad(np.asarray(coherence, dtype=np.float64),
+                    [(b, size - 1 - b) for b, size in zip(before, window_size)], mode='constant', constant_values=0.0)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window_size)
+    weights = np.zeros(len(candidate_rows), dtype=dtype)
+    for start in range(0, len(candidate_rows), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_rows, chunk_cols = candidate_rows[chunk], candidate_cols[chunk]
+        window_sums = windows[chunk_rows + (rows.start or 0), chunk_cols + (cols.start or 0)]
+        window_sums = window_sums.reshape(len(chunk_rows), -1).sum(axis=1)
+        weights[chunk] = np.where(valid[chunk_rows, chunk_cols], window_sums, 0.0)
+
+    # candidates are in index order, so the first of equal weights wins like np.argmax over all pixels
+    best = np.argmax(weights)
+    return int(candidate_rows[best]), int(candidate_cols[best]), weights[best]
+
+
+def get_reference_pixel(coherence: np.array, window_size=(5, 5), coherence_threshold=0.3,
+                        decimation: int = 1) -> Tuple[int, int]:
     """
     Args:
         coherence: array of coherence values
         window_size: window size over which to sum coherence values for each pixel
         coherence_threshold: pixels with values less than the threshold in their window will not be considered
+        decimation: if greater than 1, search for the reference pixel coarse to fine: first find the best window on a
+            grid decimated by this factor, then search the full resolution pixels around it. Faster, but may not find
+            the same pixel as the full search.
 
     Returns:
         array indices of the reference pixel
     """
+    if decimation > 1:
+        reference_pixel = _get_reference_pixel_coarse_to_fine(coherence, window_size, coherence_threshold, decimation)
+        if reference_pixel is not None:
+            return reference_pixel
 
-    def sum_valid_coherence_values(array: np.array) -> float:
-        if (array < coherence_threshold).any() or (array == 1.0).any():
-            return 0.0
-        return array.sum()
-
-    pixel_weights = scipy.ndimage.generic_filter(input=coherence, function=sum_valid_coherence_values, size=window_size,
-                                                 mode='constant', cval=0.0)
-    x, y = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+    x, y, _ = _find_max_weight(coherence, window_size, coherence_threshold, slice(None), slice(None))
     return x, y
 
 
-def geocode_back(inname, outname, width, lt, demw, demn, type_):
-    execute(f"geocode_back {inname} {width} {lt} {outname} {demw} {demn} 0 {type_}", uselogging=True)
+def _get_reference_pixel_coarse_to_fine(coherence: np.array, window_size, coherence_threshold,
+                                        decimation: int) -> Optional[Tuple[int, int]]:
+    coherence = np.asarray(coherence)
+    lines, samples = coherence.shape
+    coarse_lines, coarse_samples = -(-lines // decimation), -(-samples // decimation)
+    padded = np.zeros((coarse_lines * decimation, coarse_samples * decimation))
+    padded[:lines, :samples] = coherence
+    blocks = padded.reshape(coarse_lines, decimation, coarse_samples, decimation)
+
+    # a block is only as good as its worst pixel, so the coarse search never prefers windows with invalid pixels
+    coarse = np.where(blocks.max(axis=(1, 3)) == 1.0, 1.0, blocks.min(axis=(1, 3)))
+    coarse_window_size = tuple(-(-size // decimation) for size in window_size)
+    pixel_weights, _ = get_pixel_weights(coarse, coarse_window_size, coherence_threshold)
+    if pixel_weights.max() <= 0.0:
+        return None
+    coarse_row, coarse_col = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+
+    rows = slice(max((coarse_row - 1) * decimation, 0), min((coarse_row + 2) * decimation, lines))
+    cols = slice(max((coarse_col - 1) * decimation, 0), min((coarse_col + 2) * decimation, samples))
+    margin_rows = slice(max(rows.start - window_size[0], 0), min(rows.stop + window_size[0], lines))
+    margin_cols = slice(max(cols.start - window_size[1], 0), min(cols.stop + window_size[1], samples))
+    row, col, weight = _find_max_weight(
+        coherence[margin_rows, margin_cols], window_size, coherence_threshold,
+        slice(rows.start - margin_rows.start, rows.stop - margin_rows.start),
+        slice(cols.start - margin_cols.start, cols.stop - margin_cols.start),
+    )
+    if weight <= 0.0:
+        return None
+    return int(rows.start + row), int(cols.start + col)
 
 
-def geocode(inname, outname, inwidth, lt, outwidth, outlines, type_):
-    execute(f"geocode {lt} {inname} {inwidth} {outname} {outwidth} {outlines} - {type_}", uselogging=True)
+def geocode_back(inname, outname, width, lt, demw, demn, type_):
+    execute(f"geocode_back {inname} {width} {lt} {outname} {demw} {demn} 0 {type_}", uselogging=True)
 
 
 def data2geotiff(inname, outname, dempar, type_):
@@ -137,72 +225,129 @@ def create_phase_from_complex(incpx, outfloat, width):
     execute(f"cpx_to_real {incpx} {outfloat} {width} 4", uselogging=True)
 
 
-def get_water_mask(cc_file, width, lt, demw, demn, dempar):
-    """create water_mask geotiff file based on the cc_file (float binary file)
-    """
-    with TemporaryDirectory() as temp_dir:
-        # 2--SUN raster/BMP/TIFF, 0--FLOAT (default)
-        geocode_back(cc_file, f'{temp_dir}/tmp_mask_geo', width, lt, demw, demn, 0)
-        # 0--RASTER 8 or 24 bit uncompressed raster image, SUN (*.ras), BMP:(*.bmp), or TIFF: (*.tif)
-        # 2--FLOAT (4 bytes/value)
-        data2geotiff(f'{temp_dir}/tmp_mask_geo', f'{temp_dir}/tmpgtiff_mask_geo.tif', dempar, 2)
-        # create water_mask.tif file
-        create_water_mask(f'{temp_dir}/tmpgtiff_mask_geo.tif', 'water_mask.tif')
-
-
-def convert_water_mask_to_sar_bmp(water_mask, mwidth, mlines, lt, demw):
-    """input file is water_mask.tif file in MAP space, outptut is water_mask_sar.bmp file in SAR space.
+def _fill_water_mask_sar(water_mask_sar: np.ndarray, fill_distance: float, block_lines: int):
+    halo = int(np.ceil(fill_distance))
+    nlines = water_mask_sar.shape[0]
+    for lines, block in gamma_io.iter_blocks(water_mask_sar, block_lines):
+        first, last = max(lines.start - halo, 0), min(lines.stop + halo, nlines)
+        window = np.array(water_mask_sar[first:last])
+        unassigned = window >= UNASSIGNED
+        if unassigned.all() or not unassigned.any():
+            continue
+        distance, (nearest_azlin, nearest_rpix) = scipy.ndimage.distance_transform_edt(unassigned,
+                                                                                       return_indices=True)
+        fill = unassigned & (distance <= fill_distance)
+        fill[:lines.start - first] = False
+        fill[lines.stop - first:] = False
+        # filled pixels are marked so they are not used to fill the next block
+        window[fill] = window[nearest_azlin[fill], nearest_rpix[fill]] + FILLED
+        block[:] = window[lines.start - first:lines.stop - first]
+
+
+def map_water_mask_to_sar(water_mask: str, lt: str, mwidth: int, mlines: int, block_lines: int = 1024,
+                          fill_distance: float = 2.0, out_file: Optional[str] = None) -> np.ndarray:
+    """Map a water mask from MAP space to SAR space through a GAMMA lookup table, in one pass over both
+
+    Each MAP pixel of the water mask is assigned to the SAR pixel nearest to its lookup table coordinates, unless they
+    are 0+0j, which GAMMA uses for MAP pixels outside the SAR image. A SAR pixel is land if any MAP pixel assigned to
+    it is land. SAR pixels with no MAP pixels assigned to them take the value of the nearest assigned SAR pixel within
+    `fill_distance` pixels, and are water otherwise. The fill is done one block of SAR lines at a time, so with
+    `out_file` the memory needed does not depend on the size of the scene.
+
+    Args:
+        water_mask: water_mask.tif file in MAP space, on the grid of the lookup table
+        lt: GAMMA MAP to SAR lookup table, e.g. DEM/MAP2RDC
+        mwidth: Number of range samples of the SAR image
+        mlines: Number of azimuth lines of the SAR image
+        block_lines: Number of MAP and SAR lines to process at a time
+        fill_distance: Maximum distance in SAR pixels to fill unassigned SAR pixels from
+        out_file: GAMMA byte raster to write the mask in SAR space to; the mask is kept in memory if not given
+
+    Returns:
+        water_mask_sar: mask in SAR space with 1 for land and 0 for water, memory mapped if `out_file` is given
     """
+    if out_file is None:
+        water_mask_sar = np.full((mlines, mwidth), UNASSIGNED, dtype=np.uint8)
+    else:
+        water_mask_sar = gamma_io.create_raster(out_file, (mlines, mwidth), gamma_io.RASTER)
+        for _, block in gamma_io.iter_blocks(water_mask_sar, block_lines):
+            block[:] = UNASSIGNED
+    pixels = water_mask_sar.reshape(-1)
 
     ds = gdal.Open(water_mask)
     band = ds.GetRasterBand(1)
-    mask = band.ReadAsArray()
-    del ds
-
-    with TemporaryDirectory() as temp_dir:
-        water_im = Image.fromarray(mask)
-        water_bmp_file = f'{temp_dir}/water_mask.bmp'
-        water_im.save(water_bmp_file)
-        # map water_mask.bmp file to SAR coordinators
-        water_mask_bmp_sar_file = "water_mask_sar.bmp"
-        geocode(water_bmp_file, water_mask_bmp_sar_file, demw, lt, mwidth, mlines, 2)
+    demw, demn = ds.RasterXSize, ds.RasterYSize
+    lookup_table = gamma_io.open_raster(lt, shape=(demn, demw), dtype=gamma_io.FCOMPLEX)
+    for lines, coordinates in gamma_io.iter_blocks(lookup_table, block_lines):
+        rpix = np.rint(coordinates.real).astype(np.int64)
+        azlin = np.rint(coordinates.imag).astype(np.int64)
+        # MAP pixels outside the SAR image are 0+0j in the lookup table
+        valid = (coordinates != 0) & (rpix >= 0) & (rpix < mwidth) & (azlin >= 0) & (azlin < mlines)
+        index = azlin[valid] * mwidth + rpix[valid]
+        is_land = band.ReadAsArray(0, lines.start, demw, len(coordinates))[valid] != 0
+        water_index = index[~is_land]
+        pixels[water_index] = np.where(pixels[water_index] == LAND, LAND, WATER)
+        pixels[index[is_land]] = LAND
+    del ds, lookup_table
+
+    if fill_distance > 0:
+        _fill_water_mask_sar(water_mask_sar, fill_distance, block_lines)
+
+    for _, block in gamma_io.iter_blocks(water_mask_sar, block_lines):
+        block[:] = block % FILLED == LAND
+    if out_file is not None:
+        water_mask_sar.flush()
+    return water_mask_sar
+
+
+def mask_coherence_and_validity(cc_file: str, cc_mask_file: str, water_mask_sar: np.ndarray,
+                                block_lines: int = 1024):
+    """Mask the coherence and combine the water mask with the validity mask in SAR space, in one pass over the files
+
+    The coherence, the validity mask, and the water mask are memory mapped and processed one block of lines at a time,
+    so the memory needed does not depend on the size of the scene.
 
+    Args:
+        cc_file: GAMMA float coherence file, e.g. {ifgname}.cc
+        cc_mask_file: 8-bit BMP validity mask from `rascc_mask`, e.g. {ifgname}.adf.cc_mask.bmp
+        water_mask_sar: mask in SAR space with 1 for land and 0 for water, e.g. from `map_water_mask_to_sar`
+        block_lines: Number of lines to process at a time
 
-def apply_mask(file: str, nlines: int, nsamples: int, mask_file: str):
-    """use mask_file (bmp) to mask the file (binary), output the masked file (binary). All three file are in SAR space.
+    Returns:
+        cc_masked_file: The masked coherence, {cc_file}_masked
+        combined_mask_file: The validity mask with water set to 0, combined_mask.bmp next to `cc_mask_file`
     """
-    data = read_bin(file, nlines, nsamples)
-    mask = read_bmp(mask_file)
-
-    data[mask == 0] = 0
-
-    outfile = "{file}_masked".format(file=file)
-    data.tofile(outfile)
-
-    return outfile
+    nlines, nsamples = water_mask_sar.shape
+    coherence = read_bin(cc_file, nlines, nsamples)
+    cc_masked_file = f'{cc_file}_masked'
+    cc_masked = gamma_io.create_raster(cc_masked_file, (nlines, nsamples))
 
+    combined_mask_file = os.path.join(os.path.dirname(cc_mask_file), 'combined_mask.bmp')
+    shutil.copyfile(cc_mask_file, combined_mask_file)
+    combined_mask = gamma_io.open_bmp(combined_mask_file, mode='r+')
+    if combined_mask.shape != (nlines, nsamples):
+        raise ValueError(f'{cc_mask_file} is {combined_mask.shape} but the water mask is {(nlines, nsamples)}')
 
-def combine_water_mask(cc_mask_file, water_mask_sar_file):
-    """combine cc_mask with water_mask in SAR space
-    """
-    # read the original mask file
-    in_im = Image.open(cc_mask_file)
-    in_data = np.array(in_im)
-    in_palette = in_im.getpalette()
-
-    # combine two masks and output combined_mask.bmp
-    water_mask_sar_data = read_bmp(water_mask_sar_file)
-    in_data[water_mask_sar_data == 0] = 0
-    out_im = Image.fromarray(in_data)
-    out_im.putpalette(in_palette)
-    out_file = os.path.join(os.path.dirname(cc_mask_file), "combined_mask.bmp")
-    out_im.save(out_file)
+    for lines, water in gamma_io.iter_blocks(water_mask_sar, block_lines):
+        is_water = water == 0
+        cc_masked[lines] = np.where(is_water, 0, coherence[lines])
+        combined_mask[lines][is_water] = 0
+    cc_masked.flush()
+    combined_mask.flush()
+    del coherence, cc_masked, combined_mask
 
-    return out_file
+    return cc_masked_file, combined_mask_file
 
 
 def unwrapping_geocoding(reference, secondary, step="man", rlooks=10, alooks=2, trimode=0,
-                         alpha=0.6, apply_water_mask=False):
+                         alpha=0.6, apply_water_mask=False, include_look_vectors=False,
+                         include_displacement_maps=False, include_wrapped_phase=False, include_inc_map=False,
+                         include_dem=False):
+    """Unwrap and geocode an interferogram
+
+    The amplitude, coherence, and unwrapped phase GeoTIFFs and the color and unwrapped phase browse images are always
+    written; the other layers are only computed when their `include_*` option is set.
+    """
 
     dem = "./DEM/demseg"
     dempar = "./DEM/demseg.par"
@@ -210,7 +355,6 @@ def unwrapping_geocoding(reference, secondary, step="man", rlooks=10, alooks=2,
     ifgname = "{}_{}".format(reference, secondary)
     offit = "{}.off.it".format(ifgname)
     mmli = reference + ".mli"
-    smli = secondary + ".mli"
 
     if not os.path.isfile(dempar):
         log.error("ERROR: Unable to find dem par file {}".format(dempar))
@@ -221,13 +365,15 @@ def unwrapping_geocoding(reference, secondary, step="man", rlooks=10, alooks=2,
     if not os.path.isfile(offit):
         log.error("ERROR: Unable to find offset file {}".format(offit))
 
-    width = getParameter(offit, "interferogram_width")
-    lines = getParameter(offit, "interferogram_azimuth_lines")
-    mwidth = getParameter(mmli + ".par", "range_samples")
-    mlines = getParameter(mmli + ".par", "azimuth_lines")
-    swidth = getParameter(smli + ".par", "range_samples")
-    demw = getParameter(dempar, "width")
-    demn = getParameter(dempar, "nlines")
+    offit_parameters = gamma_io.read_par_file(offit)
+    width = offit_parameters.get("interferogram_width")
+    lines = offit_parameters.get("interferogram_azimuth_lines")
+    mmli_parameters = gamma_io.read_par_file(mmli + ".par")
+    mwidth = mmli_parameters.get("range_samples")
+    mlines = mmli_parameters.get("azimuth_lines")
+    dem_parameters = gamma_io.read_par_file(dempar)
+    demw = dem_parameters.get("width")
+    demn = dem_parameters.get("nlines")
 
     ifgf = "{}.diff0.{}".format(ifgname, step)
 
@@ -250,19 +396,19 @@ def unwrapping_geocoding(reference, secondary, step="man", rlooks=10, alooks=2,
 
     execute(f"rascc_mask {ifgname}.adf.cc {mmli} {width} 1 1 0 1 1 0.10 0.0 ", uselogging=True)
 
-    get_water_mask(f"{ifgname}.adf.cc", width, lt, demw, demn, dempar)
+    create_water_mask_from_gamma_par(dempar, 'water_mask.tif')
 
     out_file = f"{ifgname}.adf.cc_mask.bmp"
 
     cc_ref = f"{ifgname}.cc"
 
     if apply_water_mask:
-        # convert water_mak.tif in MAP to SAR space
-        convert_water_mask_to_sar_bmp('water_mask.tif', mwidth, mlines, lt, demw)
-        # combine the water mask with validity mask in SAR space
-        out_file = combine_water_mask(f"{ifgname}.adf.cc_mask.bmp", 'water_mask_sar.bmp')
-        # apply water mask in SAR space to cc
-        cc_ref = apply_mask(f'{ifgname}.cc', int(mlines), int(mwidth), 'water_mask_sar.bmp')
+        # map water_mask.tif in MAP to SAR space
+        water_mask_sar = map_water_mask_to_sar('water_mask.tif', lt, int(mwidth), int(mlines),
+                                               out_file='water_mask_sar')
+        # apply water mask in SAR space to cc and combine it with the validity mask
+        cc_ref, out_file = mask_coherence_and_validity(f'{ifgname}.cc', f"{ifgname}.adf.cc_mask.bmp", water_mask_sar)
+        del water_mask_sar
 
     data_cc = read_bin(cc_ref, int(mlines), int(mwidth))
     ref_azlin, ref_rpix = get_reference_pixel(data_cc)
@@ -287,13 +433,15 @@ def unwrapping_geocoding(reference, secondary, step="man", rlooks=10, alooks=2,
     execute(f"rasdt_pwr {ifgname}.adf.unw {mmli} {width} - - - - - {6 * np.pi} 1 rmg.cm {ifgname}.adf.unw.ras",
             uselogging=True)
 
-    execute(f"dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par"
-            f" - {ifgname}.vert.disp 1", uselogging=True)
+    if include_displacement_maps:
+        execute(f"dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par"
+                f" - {ifgname}.vert.disp 1", uselogging=True)
 
-    execute(f"dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par"
-            f" - {ifgname}.los.disp 0", uselogging=True)
+        execute(f"dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par"
+                f" - {ifgname}.los.disp 0", uselogging=True)
 
-    execute(f"gc_map2 {mmli}.par DEM/demseg.par 0 - - - - - - - inc_ell")
+    if include_inc_map:
+        execute(f"gc_map2 {mmli}.par DEM/demseg.par 0 - - - - - - - inc_ell")
 
     log.info("-------------------------------------------------")
     log.info("            End unwrapping")
@@ -304,37 +452,39 @@ def unwrapping_geocoding(reference, secondary, step="man", rlooks=10, alooks=2,
     log.info("-------------------------------------------------")
 
     geocode_back(mmli, mmli + ".geo", mwidth, lt, demw, demn, 0)
-    geocode_back(smli, smli + ".geo", swidth, lt, demw, demn, 0)
-    geocode_back("{}.sim_unw".format(ifgname), "{}.sim_unw.geo".format(ifgname), width, lt, demw, demn, 0)
     geocode_back("{}.adf.unw".format(ifgname), "{}.adf.unw.geo".format(ifgname), width, lt, demw, demn, 0)
-    geocode_back("{}.adf".format(ifgf), "{}.adf.geo".format(ifgf), width, lt, demw, demn, 1)
     geocode_back("{}.adf.unw.ras".format(ifgname), "{}.adf.unw.geo.bmp".format(ifgname), width, lt, demw, demn, 2)
     geocode_back("{}.adf.bmp".format(ifgf), "{}.adf.bmp.geo".format(ifgf), width, lt, demw, demn, 2)
     geocode_back("{}.cc".format(ifgname), "{}.cc.geo".format(ifgname), width, lt, demw, demn, 0)
-    geocode_back("{}.adf.cc".format(ifgname), "{}.adf.cc.geo".format(ifgname), width, lt, demw, demn, 0)
-    geocode_back("{}.vert.disp".format(ifgname), "{}.vert.disp.geo".format(ifgname), width, lt, demw, demn, 0)
-    geocode_back("{}.los.disp".format(ifgname), "{}.los.disp.geo".format(ifgname), width, lt, demw, demn, 0)
-
-    create_phase_from_complex("{}.adf.geo".format(ifgf), "{}.adf.geo.phase".format(ifgf), width)
 
     data2geotiff(mmli + ".geo", mmli + ".geo.tif", dempar, 2)
-    data2geotiff(smli + ".geo", smli + ".geo.tif", dempar, 2)
-    data2geotiff("{}.sim_unw.geo".format(ifgname), "{}.sim_unw.geo.tif".format(ifgname), dempar, 2)
     data2geotiff("{}.adf.unw.geo".format(ifgname), "{}.adf.unw.geo.tif".format(ifgname), dempar, 2)
     data2geotiff("{}.adf.unw.geo.bmp".format(ifgname), "{}.adf.unw.geo.bmp.tif".format(ifgname), dempar, 0)
-    data2geotiff("{}.adf.geo.phase".format(ifgf), "{}.adf.geo.tif".format(ifgf), dempar, 2)
     data2geotiff("{}.adf.bmp.geo".format(ifgf), "{}.adf.bmp.geo.tif".format(ifgf), dempar, 0)
     data2geotiff("{}.cc.geo".format(ifgname), "{}.cc.geo.tif".format(ifgname), dempar, 2)
-    data2geotiff("{}.adf.cc.geo".format(ifgname), "{}.adf.cc.geo.tif".format(ifgname), dempar, 2)
-    data2geotiff("DEM/demseg", "{}.dem.tif".format(ifgname), dempar, 2)
-    data2geotiff("{}.vert.disp.geo".format(ifgname), "{}.vert.disp.geo.org.tif".format(ifgname), dempar, 2)
-    data2geotiff("{}.los.disp.geo".format(ifgname), "{}.los.disp.geo.org.tif".format(ifgname), dempar, 2)
-    data2geotiff("DEM/inc", "{}.inc.tif".format(ifgname), dempar, 2)
-    data2geotiff("inc_ell", "{}.inc_ell.tif".format(ifgname), dempar, 2)
-    execute(f"look_vector {mmli}.par {offit} {dempar} {dem} lv_theta lv_phi", uselogging=True)
 
-    data2geotiff("lv_theta", "{}.lv_theta.tif".format(ifgname), dempar, 2)
-    data2geotiff("lv_phi", "{}.lv_phi.tif".format(ifgname), dempar, 2)
+    if include_wrapped_phase:
+        geocode_back("{}.adf".format(ifgf), "{}.adf.geo".format(ifgf), width, lt, demw, demn, 1)
+        create_phase_from_complex("{}.adf.geo".format(ifgf), "{}.adf.geo.phase".format(ifgf), width)
+        data2geotiff("{}.adf.geo.phase".format(ifgf), "{}.adf.geo.tif".format(ifgf), dempar, 2)
+
+    if include_dem:
+        data2geotiff("DEM/demseg", "{}.dem.tif".format(ifgname), dempar, 2)
+
+    if include_displacement_maps:
+        geocode_back("{}.vert.disp".format(ifgname), "{}.vert.disp.geo".format(ifgname), width, lt, demw, demn, 0)
+        geocode_back("{}.los.disp".format(ifgname), "{}.los.disp.geo".format(ifgname), width, lt, demw, demn, 0)
+        data2geotiff("{}.vert.disp.geo".format(ifgname), "{}.vert.disp.geo.org.tif".format(ifgname), dempar, 2)
+        data2geotiff("{}.los.disp.geo".format(ifgname), "{}.los.disp.geo.org.tif".format(ifgname), dempar, 2)
+
+    if include_inc_map:
+        data2geotiff("DEM/inc", "{}.inc.tif".format(ifgname), dempar, 2)
+        data2geotiff("inc_ell", "{}.inc_ell.tif".format(ifgname), dempar, 2)
+
+    if include_look_vectors:
+        execute(f"look_vector {mmli}.par {offit} {dempar} {dem} lv_theta lv_phi", uselogging=True)
+        data2geotiff("lv_theta", "{}.lv_theta.tif".format(ifgname), dempar, 2)
+        data2geotiff("lv_phi", "{}.lv_phi.tif".format(ifgname), dempar, 2)
 
     log.info("-------------------------------------------------")
     log.info("            End geocoding")
@@ -358,13 +508,23 @@ def main():
                         help="Triangulation method for mcf unwrapper: "
                              "0) filled traingular mesh (default); 1) Delaunay triangulation")
     parser.add_argument("--alpha", default=0.6, type=float, help="adf filter alpha value (def=0.6)")
+    parser.add_argument("--include-look-vectors", action="store_true", help="Create look vector theta and phi files")
+    parser.add_argument("--include-displacement-maps", action="store_true",
+                        help="Create both line of sight and vertical displacement files")
+    parser.add_argument("--include-wrapped-phase", action="store_true", help="Create wrapped phase file")
+    parser.add_argument("--include-inc-map", action="store_true",
+                        help="Create local and ellipsoidal incidence angle maps")
+    parser.add_argument("--include-dem", action="store_true", help="Create DEM file")
     args = parser.parse_args()
 
     logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s',
                         datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.INFO)
 
     unwrapping_geocoding(args.reference, args.secondary, step=args.step, rlooks=args.rlooks, alooks=args.alooks,
-                         trimode=args.tri, alpha=args.alpha)
+                         trimode=args.tri, alpha=args.alpha, include_look_vectors=args.include_look_vectors,
+                         include_displacement_maps=args.include_displacement_maps,
+                         include_wrapped_phase=args.include_wrapped_phase, include_inc_map=args.include_inc_map,
+                         include_dem=args.include_dem)
 
 
 if __name__ == "__main__":
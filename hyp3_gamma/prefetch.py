@@ -0,0 +1,115 @@
+"""Prefetch data for a job in the background while its granules download"""
+import json
+import logging
+from threading import Thread
+
+import geopandas as gpd
+import requests
+from hyp3lib import DemError
+from osgeo import ogr
+from shapely import geometry
+from shapely.ops import unary_union
+
+from hyp3_gamma import dem, water_mask
+
+log = logging.getLogger(__name__)
+
+SEARCH_URL = 'https://api.daac.asf.alaska.edu/services/search/param'
+SEARCH_TIMEOUT = 60
+JOIN_TIMEOUT = 600
+
+
+def get_granule_footprint(granule: str) -> dict:
+    """Get the footprint of a granule from the ASF Search API
+
+    Args:
+        granule: Name of the granule
+
+    Returns:
+        footprint: The WGS84 footprint as a GeoJSON geometry, split on the antimeridian if it crosses it
+    """
+    response = requests.get(SEARCH_URL, params={'granule_list': granule, 'output': 'geojson'}, timeout=SEARCH_TIMEOUT)
+    response.raise_for_status()
+    features = response.json()['features']
+    if not features:
+        raise ValueError(f'Granule {granule} not found')
+
+    footprint = geometry.shape(features[0]['geometry'])
+    min_lon, _, max_lon, _ = footprint.bounds
+    if max_lon - min_lon > 180:
+        footprint = geometry.Polygon([(lon % 360, lat) for lon, lat in footprint.exterior.coords])
+
+    return water_mask.split_geometry_on_antimeridian(geometry.mapping(footprint))
+
+
+def buffer_footprint(footprint: dict, distance: float) -> dict:
+    """Buffer a footprint that may be split on the antimeridian, splitting the result on the antimeridian"""
+    buffered = geometry.shape(footprint)
+    if buffered.geom_type == 'MultiPolygon':
+        buffered = unary_union([
+            geometry.Polygon([(lon % 360, lat) for lon, lat in part.exterior.coords]) for part in buffered.geoms
+        ])
+    buffered = buffered.buffer(distance)
+    return water_mask.split_geometry_on_antimeridian(geometry.mapping(buffered))
+
+
+def prefetch_dem_tiles(footprint: dict):
+    """Download the DEM tiles needed for a footprint into the local DEM tile cache
+
+    The tiles can only be prefetched into the local DEM tile cache, so this does nothing unless the cache is enabled by
+    setting the `HYP3_GAMMA_DEM_TILE_CACHE_BYTES` environment variable; see `dem.get_dem_tile_cache`.
+    """
+    if dem.get_dem_tile_cache() is None:
+        log.info('Not prefetching DEM tiles; the local DEM tile cache is not enabled')
+        return
+    buffered = ogr.CreateGeometryFromJson(json.dumps(buffer_footprint(footprint, 0.2)))
+    dem_file_paths = dem.cache_dem_tiles(dem.get_dem_file_paths(buffered))
+    log.info(f'Prefetched {len(dem_file_paths)} DEM tiles')
+
+
+def prefetch_water_mask(footprint: dict):
+    """Read the water mask polygons around a footprint for `water_mask.create_water_mask` to reuse"""
+    buffered = geometry.shape(buffer_footprint(footprint, 1.0))
+    water_mask.prefetch_water_mask(gpd.GeoDataFrame(index=[0], geometry=[buffered], crs='EPSG:4326'))
+    log.info('Prefetched water mask')
+
+
+def prefetch(granule: str, include_water_mask: bool = False):
+    """Prefetch the DEM tiles, and optionally the water mask, for a granule
+
+    DEM tiles are only prefetched when the local DEM tile cache is enabled with `HYP3_GAMMA_DEM_TILE_CACHE_BYTES`.
+    Errors are logged rather than raised; anything that fails to prefetch is fetched again when it is needed.
+
+    Args:
+        granule: Name of the granule to prefetch data for
+        include_water_mask: Prefetch the water mask as well as the DEM tiles
+    """
+    try:
+        footprint = get_granule_footprint(granule)
+        prefetch_dem_tiles(footprint)
+        if include_water_mask:
+            prefetch_water_mask(footprint)
+    except (requests.RequestException, ValueError, RuntimeError, OSError, DemError) as e:
+        log.warning(f'Unable to prefetch data for {granule}: {e}')
+
+
+def start_prefetch(granule: str, include_water_mask: bool = False) -> Thread:
+    """Start prefetching data for a granule in a background thread; see `prefetch`
+
+    Returns:
+        thread: The prefetch thread, to join before processing the granule
+    """
+    thread = Thread(target=prefetch, args=(granule, include_water_mask), name='prefetch', daemon=True)
+    thread.start()
+    return thread
+
+
+def join_prefetch(thread: Thread, timeout: float = JOIN_TIMEOUT):
+    """Wait at most `timeout` seconds for a prefetch thread to finish
+
+    If the prefetch is still running, processing carries on without it; anything it has not fetched yet is fetched
+    again when it is needed.
+    """
+    thread.join(timeout)
+    if thread.is_alive():
+        log.warning(f'Prefetch still running after {timeout} seconds; continuing without it')
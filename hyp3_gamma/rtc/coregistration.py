@@ -3,7 +3,7 @@
 import logging
 from math import sqrt
 
-from hyp3lib.getParameter import getParameter
+from hyp3_gamma.gamma_io import read_par_file
 
 log = logging.getLogger()
 
@@ -23,8 +23,9 @@ def get_std_dev(mk_geo_radcal2_log):
 
 def get_offset(diff_par):
     # assumes one term offset polynomial; see docs for GAMMA DIFF offset_fitm command
-    range_offset = float(getParameter(diff_par, 'range_offset_polynomial').split()[0])
-    azimuth_offset = float(getParameter(diff_par, 'azimuth_offset_polynomial').split()[0])
+    parameters = read_par_file(diff_par)
+    range_offset = parameters.get_float('range_offset_polynomial')
+    azimuth_offset = parameters.get_float('azimuth_offset_polynomial')
     offset = sqrt(range_offset ** 2 + azimuth_offset ** 2)
     return offset
 
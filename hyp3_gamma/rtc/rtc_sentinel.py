@@ -3,23 +3,21 @@
 import logging
 import os
 import shutil
+import subprocess
 import zipfile
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from glob import glob
 from math import isclose
 from pathlib import Path
 from secrets import token_hex
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import List
+from typing import List, Optional, Tuple
 
 import numpy as np
 from hyp3lib import DemError, ExecuteError, GranuleError, OrbitDownloadError
-from hyp3lib import saa_func_lib as saa
 from hyp3lib.byteSigmaScale import byteSigmaScale
-from hyp3lib.createAmp import createAmp
-from hyp3lib.execute import execute
-from hyp3lib.getParameter import getParameter
 from hyp3lib.get_orb import downloadSentinelOrbitFile
 from hyp3lib.makeAsfBrowse import makeAsfBrowse
 from hyp3lib.make_cogs import cogify_dir
@@ -29,7 +27,8 @@ from hyp3lib.system import gamma_version
 from osgeo import gdal, gdalconst, ogr
 
 import hyp3_gamma
-from hyp3_gamma.dem import get_geometry_from_kml, prepare_dem_geotiff
+from hyp3_gamma import gamma_io
+from hyp3_gamma.dem import get_geometry_from_kml, prepare_dem_gamma
 from hyp3_gamma.metadata import create_metadata_file_set_rtc
 from hyp3_gamma.rtc.coregistration import CoregistrationError, check_coregistration
 from hyp3_gamma.util import set_pixel_as_point, unzip_granule
@@ -39,19 +38,84 @@ log = logging.getLogger()
 gdal.UseExceptions()
 ogr.UseExceptions()
 
+DECIBEL_NODATA = float(np.finfo(np.float32).min)
 
-def create_decibel_tif(fi, nodata=None):
-    f = gdal.Open(fi)
-    in_nodata = f.GetRasterBand(1).GetNoDataValue()
-    _, _, trans, proj, data = saa.read_gdal_file(f)
-    data = np.ma.masked_less_equal(np.ma.masked_values(data, in_nodata), 0.)
-    powerdb = 10*np.ma.log10(data)
-    if not nodata:
-        nodata = np.finfo(data.dtype).min.astype(float)
-    outfile = fi.replace('.tif', '-db.tif')
-    saa.write_gdal_file_float(outfile, trans, proj, powerdb.filled(nodata), nodata=nodata)
-    del f
-    return outfile
+
+def scale_power(power: np.ndarray, scale: str, nodata: Optional[float] = None) -> np.ndarray:
+    """Convert backscatter values from power scale
+
+    Amplitude values are the square root of the power values. Decibel values are `10 * log10(power)`, with pixels
+    that are `nodata` or not positive set to `DECIBEL_NODATA`.
+
+    Args:
+        power: Backscatter values in power scale
+        scale: Scale to convert to; `power`, `decibel`, or `amplitude`
+        nodata: No-data value of the power values
+
+    Returns:
+        values: Backscatter values in the requested scale
+    """
+    if scale == 'power':
+        return power
+    if scale == 'amplitude':
+        with np.errstate(invalid='ignore'):
+            return np.sqrt(power)
+
+    invalid = power <= 0.0
+    if nodata is not None:
+        invalid |= np.isclose(power, nodata)
+    decibel = np.full(power.shape, DECIBEL_NODATA, dtype=power.dtype)
+    decibel[~invalid] = 10 * np.log10(power[~invalid])
+    return decibel
+
+
+def write_backscatter_tifs(power_tif: str, output_tif: str, scale: str, amp_tif: Optional[str] = None,
+                           block_lines: int = 512):
+    """Write a backscatter GeoTIFF in the requested scale, and optionally an amplitude GeoTIFF, from a power GeoTIFF
+
+    The power GeoTIFF is read once, `block_lines` lines at a time, and each block is converted with `scale_power` and
+    written to each output, so only a few blocks are held in memory at a time. Each output keeps the metadata of the
+    power GeoTIFF (e.g. `AREA_OR_POINT`), and its no-data value is the power GeoTIFF's converted to its scale.
+
+    Args:
+        power_tif: Path to the input backscatter GeoTIFF in power scale
+        output_tif: Path for the output backscatter GeoTIFF
+        scale: Scale of the output backscatter GeoTIFF; `power`, `decibel`, or `amplitude`
+        amp_tif: Path for an additional output amplitude GeoTIFF, e.g. for browse images
+        block_lines: Number of lines to read and write at a time
+    """
+    src_ds = gdal.Open(power_tif)
+    src_band = src_ds.GetRasterBand(1)
+    in_nodata = src_band.GetNoDataValue()
+    width, height = src_ds.RasterXSize, src_ds.RasterYSize
+
+    def get_nodata(output_scale: str) -> Optional[float]:
+        if in_nodata is None:
+            return {'power': None, 'decibel': DECIBEL_NODATA, 'amplitude': 0.0}[output_scale]
+        return float(scale_power(np.array([in_nodata], dtype=np.float32), output_scale, in_nodata)[0])
+
+    outputs = [(output_tif, scale)]
+    if amp_tif is not None:
+        outputs.append((amp_tif, 'amplitude'))
+
+    dst_datasets = []
+    for path, output_scale in outputs:
+        dst_ds = gdal.GetDriverByName('GTiff').Create(path, width, height, 1, gdal.GDT_Float32)
+        dst_ds.SetGeoTransform(src_ds.GetGeoTransform())
+        dst_ds.SetProjection(src_ds.GetProjection())
+        dst_ds.SetMetadata(src_ds.GetMetadata())
+        dst_ds.GetRasterBand(1).SetMetadata(src_band.GetMetadata())
+        nodata = get_nodata(output_scale)
+        if nodata is not None:
+            dst_ds.GetRasterBand(1).SetNoDataValue(nodata)
+        dst_datasets.append((dst_ds, output_scale))
+
+    for line in range(0, height, block_lines):
+        power = src_band.ReadAsArray(0, line, width, min(block_lines, height - line))
+        for dst_ds, output_scale in dst_datasets:
+            dst_ds.GetRasterBand(1).WriteArray(scale_power(power, output_scale, in_nodata), 0, line)
+
+    del src_ds, dst_datasets
 
 
 def get_product_name(granule_name, orbit_file=None, resolution=30.0, radiometry='gamma0', scale='power',
@@ -140,12 +204,48 @@ def get_polarizations(safe_dir, skip_cross_pol=True):
     return polarizations
 
 
-def run(cmd):
-    execute(cmd, uselogging=True)
+def get_omp_threads() -> int:
+    """Get the number of OpenMP threads GAMMA may use in total
+
+    Set the `OMP_NUM_THREADS` environment variable to override the default of the number of CPUs.
+    """
+    return int(os.getenv('OMP_NUM_THREADS', os.cpu_count()))
+
+
+def split_omp_threads(omp_threads: int) -> Tuple[int, int]:
+    """Split an OpenMP thread budget between co-pol and cross-pol processing, leaving at least one thread for each"""
+    cross_pol_threads = max(omp_threads // 2, 1)
+    return max(omp_threads - cross_pol_threads, 1), cross_pol_threads
+
+
+def run(cmd, omp_threads: Optional[int] = None, cwd: Optional[str] = None):
+    """Run a GAMMA command in a shell, logging its output like `hyp3lib.execute.execute`
+
+    Args:
+        cmd: The command to run
+        omp_threads: Number of OpenMP threads for the command, instead of the `OMP_NUM_THREADS` environment variable
+        cwd: Directory to run the command in, instead of the current working directory
+    """
+    env = None
+    if omp_threads is not None:
+        env = {**os.environ, 'OMP_NUM_THREADS': str(omp_threads)}
+
+    log.info(f'Running command: {cmd}')
+    result = subprocess.run(cmd, shell=True, env=env, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True)
+    lines = [line.rstrip() for line in result.stdout.splitlines() if line.rstrip()]
+    for line in lines:
+        log.info(f'Proc: {line}')
+    log.info(f'Finished: {cmd}')
+
+    if result.returncode != 0:
+        tool = cmd.split(' ')[0]
+        errors = [line for line in lines if 'ERROR' in line.upper()]
+        message = errors[0] if errors else lines[-1] if lines else f'Nonzero return value: {result.returncode}'
+        raise ExecuteError(f'{tool}: {message}')
 
 
 def prepare_dem(safe_dir: str, dem_name: str, bbox: List[float] = None, dem: str = None, pixel_size: float = 30.0):
-    dem_tif = 'dem.tif'
     dem_type = 'UNKNOWN'
     dem_image = 'dem.image'
     dem_par = 'dem.par'
@@ -163,9 +263,7 @@ def prepare_dem(safe_dir: str, dem_name: str, bbox: List[float] = None, dem: str
         else:
             geometry = get_geometry_from_kml(f'{safe_dir}/preview/map-overlay.kml')
 
-        prepare_dem_geotiff(dem_tif, geometry, pixel_size)
-        run(f'dem_import {dem_tif} {dem_image} {dem_par} - - $DIFF_HOME/scripts/egm2008-5.dem '
-            f'$DIFF_HOME/scripts/egm2008-5.dem_par - - - 1')
+        prepare_dem_gamma(dem_image, dem_par, geometry, pixel_size)
 
     else:
         raise DemError(f'DEM name "{dem_name}" is invalid; supported options are "copernicus".')
@@ -173,15 +271,15 @@ def prepare_dem(safe_dir: str, dem_name: str, bbox: List[float] = None, dem: str
     return dem_image, dem_par, dem_type
 
 
-def prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks):
+def prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks, omp_threads=None):
     log.info(f'Generating multi-looked {pol.upper()} image')
     if granule_type == 'GRDH':
-        return _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks)
+        return _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks, omp_threads)
     elif granule_type == 'SLC':
-        return _prepare_mli_image_from_slc(safe_dir, pol, orbit_file, looks)
+        return _prepare_mli_image_from_slc(safe_dir, pol, orbit_file, looks, omp_threads)
 
 
-def _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks):
+def _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks, omp_threads=None):
     annotation_xml = f'{safe_dir}/annotation/*-{pol}-*.xml'
     calibration_xml = f'{safe_dir}/annotation/calibration/calibration*-{pol}-*.xml'
     noise_xml = f'{safe_dir}/annotation/calibration/noise*-{pol}-*.xml'
@@ -191,54 +289,215 @@ def _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks):
     mli_par = f'{pol}.mli.par'
 
     with NamedTemporaryFile() as temp_image, NamedTemporaryFile() as temp_par:
-        run(f'par_S1_GRD {tiff} {annotation_xml} {calibration_xml} {noise_xml} {temp_par.name} {temp_image.name}')
+        run(f'par_S1_GRD {tiff} {annotation_xml} {calibration_xml} {noise_xml} {temp_par.name} {temp_image.name}',
+            omp_threads)
         if orbit_file:
-            run(f'S1_OPOD_vec {temp_par.name} {orbit_file}')
-        run(f'multi_look_MLI {temp_image.name} {temp_par.name} {mli_image} {mli_par} {looks} {looks} - - - 1')
+            run(f'S1_OPOD_vec {temp_par.name} {orbit_file}', omp_threads)
+        run(f'multi_look_MLI {temp_image.name} {temp_par.name} {mli_image} {mli_par} {looks} {looks} - - - 1',
+            omp_threads)
 
     return mli_image, mli_par
 
 
-def _prepare_mli_image_from_slc(safe_dir, pol, orbit_file, looks):
-    with TemporaryDirectory() as temp_dir:
-        slc_tab = f'{temp_dir}/slc_tab'
-        for swath in (1, 2, 3):
-            annotation_xml = f'{safe_dir}/annotation/*-iw{swath}-slc-{pol}-*.xml'
-            calibration_xml = f'{safe_dir}/annotation/calibration/calibration-*-iw{swath}-slc-{pol}-*.xml'
-            noise_xml = f'{safe_dir}/annotation/calibration/noise-*-iw{swath}-slc-{pol}-*.xml'
-            tiff = f'{safe_dir}/measurement/*-iw{swath}-slc-{pol}-*.tiff'
+def _prepare_slc_swath(safe_dir, pol, orbit_file, swath, temp_dir, omp_threads=None):
+    annotation_xml = f'{safe_dir}/annotation/*-iw{swath}-slc-{pol}-*.xml'
+    calibration_xml = f'{safe_dir}/annotation/calibration/calibration-*-iw{swath}-slc-{pol}-*.xml'
+    noise_xml = f'{safe_dir}/annotation/calibration/noise-*-iw{swath}-slc-{pol}-*.xml'
+    tiff = f'{safe_dir}/measurement/*-iw{swath}-slc-{pol}-*.tiff'
+
+    slc_image = f'{temp_dir}/swath{swath}.slc'
+    slc_par = f'{temp_dir}/swath{swath}.slc.par'
+    slc_tops_par = f'{temp_dir}/swath{swath}.slc.tops.par'
+
+    run(f'par_S1_SLC {tiff} {annotation_xml} {calibration_xml} {noise_xml} {slc_par} {slc_image} '
+        f'{slc_tops_par}', omp_threads)
+    if orbit_file:
+        run(f'S1_OPOD_vec {slc_par} {orbit_file}', omp_threads)
+
+    return f'{slc_image} {slc_par} {slc_tops_par}\n'
 
-            slc_image = f'{temp_dir}/swath{swath}.slc'
-            slc_par = f'{temp_dir}/swath{swath}.slc.par'
-            slc_tops_par = f'{temp_dir}/swath{swath}.slc.tops.par'
 
-            run(f'par_S1_SLC {tiff} {annotation_xml} {calibration_xml} {noise_xml} {slc_par} {slc_image} '
-                f'{slc_tops_par}')
-            if orbit_file:
-                run(f'S1_OPOD_vec {slc_par} {orbit_file}')
+def _prepare_mli_image_from_slc(safe_dir, pol, orbit_file, looks, omp_threads=None):
+    swaths = (1, 2, 3)
+    with TemporaryDirectory() as temp_dir:
+        # the swaths are converted by independent GAMMA processes, so they can run at the same time
+        with ThreadPoolExecutor(max_workers=len(swaths)) as executor:
+            slc_tab_lines = list(executor.map(
+                lambda swath: _prepare_slc_swath(safe_dir, pol, orbit_file, swath, temp_dir, omp_threads), swaths
+            ))
 
-            with open(slc_tab, 'a') as f:
-                f.write(f'{slc_image} {slc_par} {slc_tops_par}\n')
+        slc_tab = f'{temp_dir}/slc_tab'
+        with open(slc_tab, 'w') as f:
+            f.writelines(slc_tab_lines)
 
         mli_image = f'{pol}.mli'
         mli_par = f'{pol}.mli.par'
-        run(f'multi_look_ScanSAR {slc_tab} {mli_image} {mli_par} {looks * 5} {looks}')
+        run(f'multi_look_ScanSAR {slc_tab} {mli_image} {mli_par} {looks * 5} {looks}', omp_threads)
 
     return mli_image, mli_par
 
 
-def apply_speckle_filter(mli_image, mli_par, looks):
+def apply_speckle_filter(mli_image, mli_par, looks, omp_threads=None):
     log.info('Applying enhanced Lee speckle filter')
-    width = getParameter(mli_par, 'range_samples')
+    width = gamma_io.read_par_file(mli_par).get('range_samples')
     with NamedTemporaryFile() as temp_file:
-        run(f'enh_lee {mli_image} {temp_file.name} {width} {looks} 1 7 7')
+        run(f'enh_lee {mli_image} {temp_file.name} {width} {looks} 1 7 7', omp_threads)
         shutil.copy(temp_file.name, mli_image)
 
 
+def prepare_backscatter_image(safe_dir, granule_type, pol, orbit_file, looks, speckle_filter, omp_threads=None):
+    mli_image, mli_par = prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks, omp_threads)
+    if speckle_filter:
+        apply_speckle_filter(mli_image, mli_par, looks * 30, omp_threads)
+    return mli_image, mli_par
+
+
+def create_lookup_table(mli_image, mli_par, dem_image, dem_par, resolution, dem_matching, omp_threads=None):
+    log.info('Generating initial geocoding lookup table and simulating SAR image from the DEM')
+    run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected '
+        f'{resolution} 0 -q', omp_threads)
+
+    if dem_matching:
+        log.info('Determining co-registration offsets (DEM matching)')
+        try:
+            run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
+                f'corrected {resolution} 1 -q', omp_threads)
+            run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
+                f'corrected {resolution} 2 -q', omp_threads)
+            check_coregistration('mk_geo_radcal_2.log', 'corrected.diff_par', pixel_size=resolution)
+        except (ExecuteError, CoregistrationError):
+            log.warning('Co-registration offsets are too large; defaulting to dead reckoning')
+            if os.path.isfile('corrected.diff_par'):
+                os.remove('corrected.diff_par')
+
+
+def copy_lookup_table(work_dir):
+    """Link the outputs of `create_lookup_table` into a directory, to run `geocode_backscatter_image` there
+
+    The lookup tables and DEM segment are only read by `geocode_backscatter_image`, so they are hard linked rather than
+    copied, falling back to a copy where the directory is on another file system. Pixel area images (`*.pix`) are
+    always copied, since `mk_geo_radcal2` step 3 may rewrite them in both directories at once.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    for file in glob('corrected*') + glob('dem_seg*'):
+        if not os.path.isfile(file):
+            continue
+        target = os.path.join(work_dir, os.path.basename(file))
+        if os.path.exists(target):
+            os.remove(target)
+        if file.endswith('.pix'):
+            shutil.copy(file, target)
+            continue
+        try:
+            os.link(file, target)
+        except OSError:
+            shutil.copy(file, target)
+
+
+def geocode_backscatter_image(mli_image, mli_par, dem_image, dem_par, pol, resolution, radiometry, work_dir='.',
+                              omp_threads=None):
+    """Geocode a multi-looked image with the lookup table in `work_dir`, returning the `{pol}-power.tif` GeoTIFF"""
+    log.info(f'Generating terrain geocoded {pol.upper()} image and performing pixel area correction')
+    mli_image, mli_par = os.path.abspath(mli_image), os.path.abspath(mli_par)
+    dem_image, dem_par = os.path.abspath(dem_image), os.path.abspath(dem_par)
+    radiometry_flag = int(radiometry == 'gamma0')
+    run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected '
+        f'{resolution} 3 -q -c {radiometry_flag}', omp_threads, cwd=work_dir)
+    shutil.move(os.path.join(work_dir, 'mk_geo_radcal_3.log'), f'mk_geo_radcal_3_{pol}.log')
+
+    power_tif = f'{pol}-power.tif'
+    shutil.move(os.path.join(work_dir, 'corrected_cal_map.mli.tif'), power_tif)
+    return power_tif
+
+
+def sample_lookup_table(image: np.ndarray, lookup_table: np.ndarray) -> np.ndarray:
+    """Bilinearly sample an image in SAR geometry at the coordinates of a GAMMA MAP to SAR lookup table
+
+    Args:
+        image: Image in SAR geometry
+        lookup_table: Lookup table values, with range pixels as the real part and azimuth lines as the imaginary part
+
+    Returns:
+        values: Sampled values on the grid of the lookup table; NaN where the coordinates are outside the image
+    """
+    nlines, width = image.shape
+    rpix = lookup_table.real.astype(np.float64)
+    azlin = lookup_table.imag.astype(np.float64)
+    valid = (rpix >= 0) & (rpix <= width - 1) & (azlin >= 0) & (azlin <= nlines - 1)
+    rpix, azlin = rpix[valid], azlin[valid]
+
+    rpix0 = np.minimum(np.floor(rpix).astype(np.int64), max(width - 2, 0))
+    azlin0 = np.minimum(np.floor(azlin).astype(np.int64), max(nlines - 2, 0))
+    rpix1 = np.minimum(rpix0 + 1, width - 1)
+    azlin1 = np.minimum(azlin0 + 1, nlines - 1)
+    rpix_weight = rpix - rpix0
+    azlin_weight = azlin - azlin0
+
+    top = image[azlin0, rpix0] * (1 - rpix_weight) + image[azlin0, rpix1] * rpix_weight
+    bottom = image[azlin1, rpix0] * (1 - rpix_weight) + image[azlin1, rpix1] * rpix_weight
+
+    values = np.full(lookup_table.shape, np.nan, dtype=np.float32)
+    values[valid] = top * (1 - azlin_weight) + bottom * azlin_weight
+    return values
+
+
+def geocode_with_co_pol_normalization(mli_image, mli_par, co_pol_mli_image, co_pol_power_tif, pol,
+                                      lookup_table='corrected_1.map_to_rdc', block_lines=512):
+    """Geocode a multi-looked image with the pixel area normalization of the co-pol image, returning `{pol}-power.tif`
+
+    The pixel area normalization depends only on the imaging geometry and the DEM, so instead of running
+    `mk_geo_radcal2` step 3 again, each output pixel is the co-pol output pixel from `geocode_backscatter_image` scaled
+    by the ratio of this image to the co-pol image, both sampled through the lookup table with
+    `sample_lookup_table`. The lookup table and images are memory mapped and the output is written block by block.
+
+    Args:
+        mli_image: Multi-looked image to geocode
+        mli_par: GAMMA parameter file of the multi-looked image
+        co_pol_mli_image: Co-pol multi-looked image on the same SAR grid, as geocoded to `co_pol_power_tif`
+        co_pol_power_tif: Geocoded, normalized co-pol GeoTIFF on the grid of the lookup table
+        pol: Polarization of the multi-looked image
+        lookup_table: GAMMA MAP to SAR lookup table used to geocode the co-pol image
+        block_lines: Number of lines of the output to write at a time
+    """
+    mli = gamma_io.open_raster(mli_image, mli_par, dtype=gamma_io.FLOAT)
+    co_pol_mli = gamma_io.open_raster(co_pol_mli_image, shape=mli.shape, dtype=mli.dtype)
+
+    src_ds = gdal.Open(co_pol_power_tif)
+    src_band = src_ds.GetRasterBand(1)
+    nodata = src_band.GetNoDataValue()
+    fill_value = 0.0 if nodata is None else nodata
+    map_width, map_lines = src_ds.RasterXSize, src_ds.RasterYSize
+    coordinates = gamma_io.open_raster(lookup_table, shape=(map_lines, map_width), dtype=gamma_io.FCOMPLEX)
+
+    power_tif = f'{pol}-power.tif'
+    dst_ds = gdal.GetDriverByName('GTiff').Create(power_tif, map_width, map_lines, 1, gdal.GDT_Float32)
+    dst_ds.SetGeoTransform(src_ds.GetGeoTransform())
+    dst_ds.SetProjection(src_ds.GetProjection())
+    dst_ds.SetMetadataItem('AREA_OR_POINT', src_ds.GetMetadataItem('AREA_OR_POINT'))
+    dst_band = dst_ds.GetRasterBand(1)
+    if nodata is not None:
+        dst_band.SetNoDataValue(nodata)
+
+    log.info(f'Geocoding {pol.upper()} image with the {co_pol_power_tif} pixel area normalization')
+    for lines, block_coordinates in gamma_io.iter_blocks(coordinates, block_lines):
+        co_pol_power = src_band.ReadAsArray(0, lines.start, map_width, len(block_coordinates))
+        sampled = sample_lookup_table(mli, block_coordinates)
+        co_pol_sampled = sample_lookup_table(co_pol_mli, block_coordinates)
+
+        valid = (co_pol_sampled > 0) & np.isfinite(sampled) & (co_pol_power != fill_value)
+        power = np.full(co_pol_power.shape, fill_value, dtype=np.float32)
+        power[valid] = co_pol_power[valid] * sampled[valid] / co_pol_sampled[valid]
+        dst_band.WriteArray(power, 0, lines.start)
+
+    del src_ds, dst_ds, mli, co_pol_mli, coordinates
+    return power_tif
+
+
 def create_area_geotiff(data_in, lookup_table, mli_par, dem_par, output_name):
-    width_in = getParameter(mli_par, 'range_samples')
-    width_out = getParameter(dem_par, 'width')
-    nlines_out = getParameter(dem_par, 'nlines')
+    width_in = gamma_io.read_par_file(mli_par).get('range_samples')
+    dem_parameters = gamma_io.read_par_file(dem_par)
+    width_out = dem_parameters.get('width')
+    nlines_out = dem_parameters.get('nlines')
 
     with NamedTemporaryFile() as temp_file:
         run(f'geocode_back {data_in} {width_in} {lookup_table} {temp_file.name} {width_out} {nlines_out} 2')
@@ -279,7 +538,8 @@ def rtc_sentinel_gamma(safe_dir: str, resolution: float = 30.0, radiometry: str
                        speckle_filter: bool = False, dem_matching: bool = False, include_dem: bool = False,
                        include_inc_map: bool = False, include_scattering_area: bool = False, include_rgb: bool = False,
                        dem: str = None, bbox: List[float] = None, looks: int = None, skip_cross_pol: bool = False,
-                       dem_name: str = 'copernicus') -> str:
+                       dem_name: str = 'copernicus', concurrent_polarizations: bool = False,
+                       reuse_pixel_area: bool = False) -> str:
     """Creates a Radiometrically Terrain-Corrected (RTC) product from a Sentinel-1 scene using GAMMA software.
 
     Args:
@@ -303,6 +563,11 @@ def rtc_sentinel_gamma(safe_dir: str, resolution: float = 30.0, radiometry: str
         skip_cross_pol: Do not include the co-polarization backscatter GeoTIFF in the output package.
         dem_name: DEM to use for RTC processing; `copernicus` is the only valid option.
             `dem_name` is ignored if `dem` is provided.
+        concurrent_polarizations: For dual-polarization scenes, prepare the cross-polarization image while the
+            co-polarization image is geocoded, then geocode both at once, splitting the `OMP_NUM_THREADS` (default:
+            number of CPUs) GAMMA threads between them.
+        reuse_pixel_area: For dual-polarization scenes, geocode the cross-polarization image with the pixel area
+            normalization of the co-polarization image instead of computing it again.
 
     Returns:
         product_name: Name of the output product directory
@@ -335,50 +600,51 @@ def rtc_sentinel_gamma(safe_dir: str, resolution: float = 30.0, radiometry: str
     log.info('Preparing DEM')
     dem_image, dem_par, dem_type = prepare_dem(safe_dir, dem_name, bbox, dem, resolution)
 
-    for pol in polarizations:
-        mli_image, mli_par = prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks)
-        if speckle_filter:
-            apply_speckle_filter(mli_image, mli_par, looks * 30)
-
-        if pol == polarizations[0]:
-            log.info('Generating initial geocoding lookup table and simulating SAR image from the DEM')
-            run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected '
-                f'{resolution} 0 -q')
-
-            if dem_matching:
-                log.info('Determining co-registration offsets (DEM matching)')
-                try:
-                    run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
-                        f'corrected {resolution} 1 -q')
-                    run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
-                        f'corrected {resolution} 2 -q')
-                    check_coregistration('mk_geo_radcal_2.log', 'corrected.diff_par', pixel_size=resolution)
-                except (ExecuteError, CoregistrationError):
-                    log.warning('Co-registration offsets are too large; defaulting to dead reckoning')
-                    if os.path.isfile('corrected.diff_par'):
-                        os.remove('corrected.diff_par')
-
-        log.info(f'Generating terrain geocoded {pol.upper()} image and performing pixel area correction')
-        radiometry_flag = int(radiometry == 'gamma0')
-        run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected '
-            f'{resolution} 3 -q -c {radiometry_flag}')
-        shutil.move('mk_geo_radcal_3.log', f'mk_geo_radcal_3_{pol}.log')
-
-        power_tif = f'{pol}-power.tif'
-        shutil.move('corrected_cal_map.mli.tif', power_tif)
-
-        tmp_tif = createAmp(power_tif, nodata=0)
-        amp_tif = f'{pol}-amp.tif'
-        shutil.move(tmp_tif, amp_tif)
+    if concurrent_polarizations and len(polarizations) > 1:
+        log.info(f'Processing {" and ".join(pol.upper() for pol in polarizations)} concurrently')
+        co_pol_threads, cross_pol_threads = split_omp_threads(get_omp_threads())
+        cross_pol_dir = f'{polarizations[1]}_geocoding'
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            cross_pol_mli = executor.submit(prepare_backscatter_image, safe_dir, granule_type, polarizations[1],
+                                            orbit_file, looks, speckle_filter, cross_pol_threads)
+            mli_image, mli_par = prepare_backscatter_image(safe_dir, granule_type, polarizations[0], orbit_file,
+                                                           looks, speckle_filter, co_pol_threads)
+            create_lookup_table(mli_image, mli_par, dem_image, dem_par, resolution, dem_matching, co_pol_threads)
+
+            if reuse_pixel_area:
+                co_pol_power_tif = geocode_backscatter_image(mli_image, mli_par, dem_image, dem_par, polarizations[0],
+                                                             resolution, radiometry, omp_threads=co_pol_threads)
+                cross_pol_mli_image, cross_pol_mli_par = cross_pol_mli.result()
+                geocode_with_co_pol_normalization(cross_pol_mli_image, cross_pol_mli_par, mli_image,
+                                                  co_pol_power_tif, polarizations[1])
+            else:
+                copy_lookup_table(cross_pol_dir)
+                cross_pol_mli_image, cross_pol_mli_par = cross_pol_mli.result()
+                cross_pol_power_tif = executor.submit(geocode_backscatter_image, cross_pol_mli_image,
+                                                      cross_pol_mli_par, dem_image, dem_par, polarizations[1],
+                                                      resolution, radiometry, cross_pol_dir, cross_pol_threads)
+                geocode_backscatter_image(mli_image, mli_par, dem_image, dem_par, polarizations[0], resolution,
+                                          radiometry, omp_threads=co_pol_threads)
+                cross_pol_power_tif.result()
+                shutil.rmtree(cross_pol_dir)
+    else:
+        for pol in polarizations:
+            mli_image, mli_par = prepare_backscatter_image(safe_dir, granule_type, pol, orbit_file, looks,
+                                                           speckle_filter)
+            if pol == polarizations[0]:
+                create_lookup_table(mli_image, mli_par, dem_image, dem_par, resolution, dem_matching)
+                co_pol_mli_image = mli_image
+                co_pol_power_tif = geocode_backscatter_image(mli_image, mli_par, dem_image, dem_par, pol,
+                                                             resolution, radiometry)
+            elif reuse_pixel_area:
+                geocode_with_co_pol_normalization(mli_image, mli_par, co_pol_mli_image, co_pol_power_tif, pol)
+            else:
+                geocode_backscatter_image(mli_image, mli_par, dem_image, dem_par, pol, resolution, radiometry)
 
+    for pol in polarizations:
         output_tif = f'{product_name}/{product_name}_{pol.upper()}.tif'
-        if scale == 'power':
-            shutil.copy(power_tif, output_tif)
-        elif scale == 'decibel':
-            decibel_tif = create_decibel_tif(power_tif)
-            shutil.copy(decibel_tif, output_tif)
-        else:
-            shutil.copy(amp_tif, output_tif)
+        amp_tif = f'{pol}-amp.tif' if pol == polarizations[0] else None
+        write_backscatter_tifs(f'{pol}-power.tif', output_tif, scale, amp_tif)
 
     log.info('Collecting output GeoTIFFs')
     run(f'data2geotiff dem_seg.par corrected.ls_map 5 {product_name}/{product_name}_ls_map.tif')
@@ -465,6 +731,11 @@ def main():
     parser.add_argument('--looks', type=int,
                         help='Number of azimuth looks to take. Will be selected automatically if not specified.  Range '
                              'and filter looks are selected automatically based on azimuth looks and product type.')
+    parser.add_argument('--concurrent-polarizations', action='store_true',
+                        help='Process the co- and cross-polarization images of dual-polarization scenes concurrently.')
+    parser.add_argument('--reuse-pixel-area', action='store_true',
+                        help='Geocode the cross-polarization image of dual-polarization scenes with the pixel area '
+                             'normalization of the co-polarization image.')
     args = parser.parse_args()
 
     logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s',
@@ -491,7 +762,9 @@ def main():
                        bbox=args.bbox,
                        looks=args.looks,
                        skip_cross_pol=args.skip_cross_pol,
-                       dem_name=args.dem_name)
+                       dem_name=args.dem_name,
+                       concurrent_polarizations=args.concurrent_polarizations,
+                       reuse_pixel_area=args.reuse_pixel_area)
 
     log.info('===================================================================')
     log.info('                Sentinel RTC Program - Completed')
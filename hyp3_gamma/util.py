@@ -33,6 +33,18 @@ class GDALConfigManager:
             gdal.SetConfigOption(key, value)
 
 
+def get_cache_dir() -> Path:
+    """Get the local directory for caching data that can be reused between jobs
+
+    Set the `HYP3_GAMMA_CACHE_DIR` environment variable to override the default of `$XDG_CACHE_HOME/hyp3_gamma`
+    (or `~/.cache/hyp3_gamma`).
+    """
+    cache_dir = os.getenv('HYP3_GAMMA_CACHE_DIR')
+    if cache_dir is None:
+        cache_dir = Path(os.getenv('XDG_CACHE_HOME', Path.home() / '.cache')) / 'hyp3_gamma'
+    return Path(cache_dir)
+
+
 def get_granule(granule):
     download_url = get_download_url(granule)
     zip_file = download_file(download_url, chunk_size=10485760)
@@ -1,30 +1,45 @@
 """Create and apply a water body mask"""
 import json
-import subprocess
+import logging
+import os
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from functools import lru_cache
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from threading import Lock
+from typing import Optional, Sequence, Tuple, Union
 
 import geopandas as gpd
-from osgeo import gdal
+from osgeo import gdal, ogr, osr
 from pyproj import CRS
-from shapely import geometry
+from shapely import geometry, wkb
+from shapely.geometry import mapping, shape
 
-from hyp3_gamma.util import GDALConfigManager
+from hyp3_gamma import antimeridian
+from hyp3_gamma.dem import get_gamma_dem_grid
+from hyp3_gamma.util import GDALConfigManager, get_cache_dir
 
+log = logging.getLogger(__name__)
 gdal.UseExceptions()
 
+WATER_MASK_SHAPEFILE = '/vsicurl/https://asf-dem-west.s3.amazonaws.com/WATER_MASK/GSHHG/hyp3_water_mask_20220912.shp'
+WATER_MASK_PYRAMID_RESOLUTIONS = (1, 2, 4)
 
-def split_geometry_on_antimeridian(geometry: dict):
-    geometry_as_bytes = json.dumps(geometry).encode()
-    cmd = ['ogr2ogr', '-wrapdateline', '-datelineoffset', '20', '-f', 'GeoJSON', '/vsistdout/', '/vsistdin/']
-    geojson_str = subprocess.run(cmd, input=geometry_as_bytes, stdout=subprocess.PIPE, check=True).stdout
-    return json.loads(geojson_str)['features'][0]['geometry']
+# the (extent, polygons) of the latest prefetched water mask extract
+_water_mask_extract: Optional[Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]] = None
+_water_mask_extract_lock = Lock()
 
 
-def get_envelope_wgs84(input_image: str):
+def split_geometry_on_antimeridian(geometry: dict) -> dict:
+    """Split a GeoJSON polygon on the antimeridian; see `antimeridian.wrap_dateline`"""
+    wrapped = antimeridian.wrap_dateline(shape(geometry))
+    return json.loads(json.dumps(mapping(wrapped)))
+
+
+def get_envelope_wgs84(input_image: Union[str, gdal.Dataset]):
     """Get the envelope around a GeoTIFF.
     Args:
-        input_image: The path to the desired GeoTIFF, as a string.
+        input_image: The path to the desired GeoTIFF, as a string, or an open GDAL dataset.
     Returns:
         envelope_gdf_wgs84: The WGS84 envelope around the GeoTIFF, as a GeoDataFrame.
     """
@@ -47,6 +62,272 @@ def get_envelope_wgs84(input_image: str):
     return envelope_gdf_wgs84
 
 
+def get_water_mask_store_path() -> Path:
+    return get_cache_dir() / 'water_mask' / f'{Path(WATER_MASK_SHAPEFILE).stem}.gpkg'
+
+
+def import_water_mask(shapefile: str = WATER_MASK_SHAPEFILE, output: Optional[Path] = None):
+    """Import the water mask polygons into a local GeoPackage with an R-tree spatial index
+
+    Reads of a bounding box from the GeoPackage only touch the polygons near it, unlike reads from the remote shapefile.
+
+    Args:
+        shapefile: Path to the water mask polygons, in any OGR-readable format
+        output: Path for the GeoPackage, replaced atomically if it exists; defaults to `get_water_mask_store_path()`
+    """
+    if output is None:
+        output = get_water_mask_store_path()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with TemporaryDirectory(prefix=f'.{output.name}-', dir=output.parent) as temp_dir:
+        temp_path = Path(temp_dir) / output.name
+        gdal.VectorTranslate(str(temp_path), shapefile, format='GPKG', layerName='water_mask',
+                             layerCreationOptions=['SPATIAL_INDEX=YES'])
+        os.replace(temp_path, output)
+
+
+def get_water_mask_source() -> str:
+    """Get the path to read water mask polygons from: the local store if it has been imported, else the shapefile"""
+    store = get_water_mask_store_path()
+    if store.exists():
+        return str(store)
+    return WATER_MASK_SHAPEFILE
+
+
+def import_water_mask_store():
+    """Entrypoint to import the water mask polygons into a local spatially indexed store"""
+    parser = ArgumentParser(description=import_water_mask_store.__doc__,
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--shapefile', default=WATER_MASK_SHAPEFILE, help='Water mask polygons to import')
+    parser.add_argument('--output', type=Path, default=get_water_mask_store_path(),
+                        help='Path for the GeoPackage')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.INFO)
+
+    log.info(f'Importing {args.shapefile} into {args.output}')
+    import_water_mask(args.shapefile, args.output)
+
+
+def prefetch_water_mask(extent: gpd.GeoDataFrame):
+    """Read the water mask polygons intersecting an extent and keep them for later calls to `read_water_mask`
+
+    Only the latest extract is kept, replacing any earlier one.
+
+    Args:
+        extent: The WGS84 extent to read, as a GeoDataFrame
+    """
+    global _water_mask_extract
+    mask = gpd.read_file(get_water_mask_source(), mask=extent)
+    with _water_mask_extract_lock:
+        _water_mask_extract = (extent, mask)
+
+
+def read_water_mask(envelope_gdf_wgs84: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """Read the water mask polygons clipped to an envelope
+
+    Polygons are taken from an extract kept by `prefetch_water_mask` when one covers the envelope, and are otherwise
+    read from the local store if it has been imported, else from `WATER_MASK_SHAPEFILE` (see `get_water_mask_source`).
+
+    Args:
+        envelope_gdf_wgs84: The WGS84 envelope to clip to, as a GeoDataFrame
+
+    Returns:
+        mask: The clipped water mask polygons, as a GeoDataFrame
+    """
+    envelope = envelope_gdf_wgs84.unary_union
+    with _water_mask_extract_lock:
+        water_mask_extract = _water_mask_extract
+
+    if water_mask_extract is not None and water_mask_extract[0].unary_union.contains(envelope):
+        log.info('Using prefetched water mask extract')
+        extract = water_mask_extract[1]
+        mask = extract[extract.intersects(envelope)]
+    else:
+        mask = gpd.read_file(get_water_mask_source(), mask=envelope_gdf_wgs84)
+
+    return gpd.clip(mask, envelope_gdf_wgs84)
+
+
+def get_water_mask_pyramid_tile_name(lon: int, lat: int) -> str:
+    return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}.tif"
+
+
+def build_water_mask_pyramid(shapefile: str, output_dir: Path,
+                             resolutions: Sequence[int] = WATER_MASK_PYRAMID_RESOLUTIONS,
+                             bounds: Tuple[int, int, int, int] = (-180, -90, 180, 90)):
+    """Rasterize a water mask shapefile into 1x1 degree WGS84 GeoTIFF tiles at several resolutions
+
+    Each resolution is rasterized from the polygons with the same semantics as `create_water_mask`: pixels touched by
+    land are 1 and all other pixels are 0. Tiles that no polygon intersects are all 0 and are not written. A VRT
+    mosaic of each resolution's tiles is written to `output_dir/water_mask_<resolution>as.vrt`.
+
+    Args:
+        shapefile: Path to the water mask polygons, in any OGR-readable format
+        output_dir: Directory for the pyramid
+        resolutions: Pixel sizes of the pyramid levels, in arc seconds
+        bounds: Whole degree (west, south, east, north) bounds of the tiles to build
+    """
+    src_ds = gdal.OpenEx(shapefile, gdal.OF_VECTOR)
+    layer = src_ds.GetLayer()
+    tiles = {resolution: [] for resolution in resolutions}
+
+    lon_lat_srs = osr.SpatialReference()
+    lon_lat_srs.ImportFromEPSG(4326)
+
+    west, south, east, north = bounds
+    for lat in range(south, north):
+        for lon in range(west, east):
+            layer.SetSpatialFilterRect(lon, lat, lon + 1, lat + 1)
+            if layer.GetFeatureCount() == 0:
+                continue
+
+            for resolution in resolutions:
+                tile = output_dir / f'{resolution}as' / get_water_mask_pyramid_tile_name(lon, lat)
+                tile.parent.mkdir(parents=True, exist_ok=True)
+                with GDALConfigManager(OGR_ENABLE_PARTIAL_REPROJECTION='YES'):
+                    gdal.Rasterize(str(tile), src_ds, outputBounds=[lon, lat, lon + 1, lat + 1],
+                                   xRes=resolution / 3600, yRes=resolution / 3600, outputType=gdal.GDT_Byte,
+                                   outputSRS='EPSG:4326', allTouched=True, burnValues=[1], initValues=[0],
+                                   creationOptions=['COMPRESS=DEFLATE', 'TILED=YES'])
+                tiles[resolution].append(str(tile))
+        log.info(f'Rasterized water mask tiles for latitude {lat}')
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for resolution, resolution_tiles in tiles.items():
+        mosaic = str(output_dir / f'water_mask_{resolution}as.vrt')
+        if resolution_tiles:
+            gdal.BuildVRT(mosaic, resolution_tiles, outputBounds=[west, south, east, north],
+                          xRes=resolution / 3600, yRes=resolution / 3600)
+        else:
+            vrt_ds = gdal.GetDriverByName('VRT').Create(mosaic, (east - west) * 3600 // resolution,
+                                                        (north - south) * 3600 // resolution, 1, gdal.GDT_Byte)
+            vrt_ds.SetGeoTransform([west, resolution / 3600, 0, north, 0, -resolution / 3600])
+            vrt_ds.SetProjection(lon_lat_srs.ExportToWkt())
+            del vrt_ds
+    del src_ds
+
+
+def get_water_mask_pyramid() -> Optional[str]:
+    """Get the location of the pre-rasterized water mask pyramid, if configured
+
+    Set the `HYP3_GAMMA_WATER_MASK_PYRAMID` environment variable to the directory or URL prefix of a pyramid built by
+    `build_water_mask_pyramid` for `create_water_mask` to read from it instead of rasterizing the water mask polygons.
+    """
+    return os.getenv('HYP3_GAMMA_WATER_MASK_PYRAMID')
+
+
+def get_pixel_size_degrees(ds: gdal.Dataset) -> float:
+    """Get the approximate pixel width of a dataset in degrees of latitude"""
+    srs = osr.SpatialReference(wkt=ds.GetProjection())
+    pixel_size = abs(ds.GetGeoTransform()[1])
+    return pixel_size if srs.IsGeographic() else pixel_size / 111320
+
+
+def warp_water_mask_pyramid(dst_ds: gdal.Dataset, pyramid: str):
+    """Fill a dataset with the water mask from the finest pyramid level no finer than needed for its pixels
+
+    Pixels are 1 if any pyramid pixel within them is 1, which approximates land touching the pixel.
+    """
+    pixel_size_arc_seconds = get_pixel_size_degrees(dst_ds) * 3600
+
+    levels = sorted(WATER_MASK_PYRAMID_RESOLUTIONS)
+    level = max([resolution for resolution in levels if resolution <= pixel_size_arc_seconds], default=levels[0])
+    log.info(f'Warping water mask from {level} arc second pyramid level')
+    gdal.Warp(dst_ds, f'{pyramid}/water_mask_{level}as.vrt', resampleAlg='max', multithread=True)
+
+
+def main():
+    """Entrypoint to build a pre-rasterized water mask pyramid; see `build_water_mask_pyramid`"""
+    parser = ArgumentParser(description=main.__doc__, formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('output_dir', type=Path, help='Directory for the pyramid')
+    parser.add_argument('--shapefile', default=WATER_MASK_SHAPEFILE, help='Water mask polygons to rasterize')
+    parser.add_argument('--resolutions', type=int, nargs='+', default=WATER_MASK_PYRAMID_RESOLUTIONS,
+                        help='Pixel sizes of the pyramid levels, in arc seconds')
+    parser.add_argument('--bounds', type=int, nargs=4, default=[-180, -90, 180, 90],
+                        metavar=('WEST', 'SOUTH', 'EAST', 'NORTH'), help='Whole degree bounds of the tiles to build')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.INFO)
+
+    build_water_mask_pyramid(args.shapefile, args.output_dir, args.resolutions, args.bounds)
+
+
+@lru_cache(maxsize=8)
+def read_simplified_water_mask(envelope_wkb: bytes, tolerance: float) -> gpd.GeoDataFrame:
+    """Read the water mask polygons clipped to an envelope and simplified, preserving topology
+
+    Results are cached per envelope and tolerance, so they must not be modified.
+
+    Args:
+        envelope_wkb: The WGS84 envelope to clip to, as WKB
+        tolerance: The maximum distance in degrees a simplified polygon edge may move
+
+    Returns:
+        mask: The clipped and simplified water mask polygons, as a GeoDataFrame
+    """
+    envelope_gdf_wgs84 = gpd.GeoDataFrame(index=[0], geometry=[wkb.loads(envelope_wkb)], crs='EPSG:4326')
+    mask = read_water_mask(envelope_gdf_wgs84)
+    return mask.set_geometry(mask.geometry.simplify(tolerance, preserve_topology=True))
+
+
+def rasterize_polygons(dst_ds: gdal.Dataset, polygons: gpd.GeoDataFrame):
+    """Burn a value of 1 into every pixel of a dataset touched by a polygon
+
+    The polygons are passed to GDAL in an in-memory layer and reprojected to the dataset's projection as they are
+    burned.
+
+    Args:
+        dst_ds: The dataset to burn into
+        polygons: The polygons to burn, as a GeoDataFrame
+    """
+    srs = osr.SpatialReference()
+    srs.SetFromUserInput(polygons.crs.to_wkt())
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    mem_ds = ogr.GetDriverByName('Memory').CreateDataSource('')
+    layer = mem_ds.CreateLayer('mask', srs, ogr.wkbUnknown)
+    for polygon in polygons.geometry:
+        if polygon is None or polygon.is_empty:
+            continue
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(ogr.CreateGeometryFromWkb(polygon.wkb))
+        layer.CreateFeature(feature)
+
+    with GDALConfigManager(OGR_ENABLE_PARTIAL_REPROJECTION='YES'):
+        gdal.RasterizeLayer(dst_ds, [1], layer, burn_values=[1], options=['ALL_TOUCHED=TRUE'])
+    del mem_ds
+
+
+def create_water_mask_dataset(output_image: str, width: int, height: int, geotransform: Sequence[float],
+                              srs: osr.SpatialReference, area_or_point: Optional[str],
+                              gdal_format='GTiff') -> gdal.Dataset:
+    """Create an empty water mask image on a given grid, ready for `fill_water_mask`"""
+    driver_options = []
+    if gdal_format == 'GTiff':
+        driver_options = ['COMPRESS=LZW', 'TILED=YES', 'NUM_THREADS=ALL_CPUS']
+
+    dst_ds = gdal.GetDriverByName(gdal_format).Create(output_image, width, height, 1, gdal.GDT_Byte, driver_options)
+    dst_ds.SetGeoTransform(geotransform)
+    dst_ds.SetSpatialRef(srs)
+    dst_ds.SetMetadataItem('AREA_OR_POINT', area_or_point)
+    return dst_ds
+
+
+def fill_water_mask(dst_ds: gdal.Dataset):
+    """Write the water mask over the grid of a water mask image; see `create_water_mask`"""
+    envelope_gdf_wgs84 = get_envelope_wgs84(dst_ds)
+
+    pyramid = get_water_mask_pyramid()
+    if pyramid is not None and envelope_gdf_wgs84.geometry[0].geom_type == 'Polygon':
+        warp_water_mask_pyramid(dst_ds, pyramid)
+    else:
+        tolerance = get_pixel_size_degrees(dst_ds) / 4
+        mask = read_simplified_water_mask(envelope_gdf_wgs84.geometry[0].wkb, tolerance)
+        rasterize_polygons(dst_ds, mask)
+
+
 def create_water_mask(input_image: str, output_image: str, gdal_format='GTiff'):
     """Create a water mask GeoTIFF with the same geometry as a given input GeoTIFF
 
@@ -56,39 +337,37 @@ def create_water_mask(input_image: str, output_image: str, gdal_format='GTiff'):
     Shoreline data is unbuffered and pixel values of 1 indicate land touches the pixel and 0 indicates there is no
     land in the pixel.
 
+    Polygons are simplified with a tolerance of a quarter of the output pixel size before they are rasterized, so
+    rasterization cost follows the output resolution rather than the coastline detail.
+
+    When a pre-rasterized water mask pyramid is configured (see `get_water_mask_pyramid`), the water mask is warped
+    from the pyramid instead, except for images crossing the antimeridian.
+
     Args:
         input_image: Path for the input GDAL-compatible image
         output_image: Path for the output image
         gdal_format: GDAL format name to create output image as
     """
     src_ds = gdal.Open(input_image)
+    dst_ds = create_water_mask_dataset(output_image, src_ds.RasterXSize, src_ds.RasterYSize,
+                                       src_ds.GetGeoTransform(), src_ds.GetSpatialRef(),
+                                       src_ds.GetMetadataItem('AREA_OR_POINT'), gdal_format)
+    fill_water_mask(dst_ds)
+    del src_ds, dst_ds
 
-    driver_options = []
-    if gdal_format == 'GTiff':
-        driver_options = ['COMPRESS=LZW', 'TILED=YES', 'NUM_THREADS=ALL_CPUS']
 
-    dst_ds = gdal.GetDriverByName(gdal_format).Create(
-        output_image,
-        src_ds.RasterXSize,
-        src_ds.RasterYSize,
-        1,
-        gdal.GDT_Byte,
-        driver_options,
-    )
-    dst_ds.SetGeoTransform(src_ds.GetGeoTransform())
-    dst_ds.SetProjection(src_ds.GetProjection())
-    dst_ds.SetMetadataItem('AREA_OR_POINT', src_ds.GetMetadataItem('AREA_OR_POINT'))
-
-    envelope_gdf_wgs84 = get_envelope_wgs84(input_image)
-
-    mask_location = '/vsicurl/https://asf-dem-west.s3.amazonaws.com/WATER_MASK/GSHHG/hyp3_water_mask_20220912.shp'
-    mask = gpd.read_file(mask_location, mask=envelope_gdf_wgs84)
-    mask = gpd.clip(mask, envelope_gdf_wgs84)
-
-    with TemporaryDirectory() as temp_dir:
-        temp_file = str(Path(temp_dir) / 'mask.shp')
-        mask.to_file(temp_file, driver='ESRI Shapefile')
-        with GDALConfigManager(OGR_ENABLE_PARTIAL_REPROJECTION='YES'):
-            gdal.Rasterize(dst_ds, temp_file, allTouched=True, burnValues=[1])
+def create_water_mask_from_gamma_par(dem_par: str, output_image: str, gdal_format='GTiff'):
+    """Create a water mask GeoTIFF on the grid of a GAMMA DEM, without reading the DEM or any image on its grid
 
-    del src_ds, dst_ds
+    The output has the same grid as any image geocoded to the DEM and converted with GAMMA's `data2geotiff`; see
+    `create_water_mask` for how the water mask is made.
+
+    Args:
+        dem_par: Path to the GAMMA DEM parameter file
+        output_image: Path for the output image
+        gdal_format: GDAL format name to create output image as
+    """
+    width, nlines, geotransform, srs = get_gamma_dem_grid(dem_par)
+    dst_ds = create_water_mask_dataset(output_image, width, nlines, geotransform, srs, 'Point', gdal_format)
+    fill_water_mask(dst_ds)
+    del dst_ds
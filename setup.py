@@ -41,6 +41,7 @@ setup(
         'numpy>=1.21,<1.22',
         'pillow',
         'python-dateutil',
+        'requests',
         'rtree'
     ],
 
@@ -60,12 +61,15 @@ setup(
 
     entry_points={'console_scripts': [
             'hyp3_gamma = hyp3_gamma.__main__:main',
+            'refresh_dem_index = hyp3_gamma.dem:refresh_dem_index',
             'rtc = hyp3_gamma.__main__:rtc',
             'rtc_sentinel.py = hyp3_gamma.rtc.rtc_sentinel:main',
             'insar = hyp3_gamma.__main__:insar',
             'ifm_sentinel.py = hyp3_gamma.insar.ifm_sentinel:main',
             'interf_pwr_s1_lt_tops_proc.py = hyp3_gamma.insar.interf_pwr_s1_lt_tops_proc:main',
             'unwrapping_geocoding.py = hyp3_gamma.insar.unwrapping_geocoding:main',
+            'build_water_mask_pyramid = hyp3_gamma.water_mask:main',
+            'import_water_mask = hyp3_gamma.water_mask:import_water_mask_store',
         ]
     },
 
@@ -1,6 +1,10 @@
 import numpy as np
+import scipy.ndimage
+from PIL import Image
+from osgeo import gdal
 
-from hyp3_gamma.insar.unwrapping_geocoding import get_reference_pixel
+from hyp3_gamma.insar import ifm_sentinel, unwrapping_geocoding
+from hyp3_gamma.insar.unwrapping_geocoding import get_reference_pixel, map_water_mask_to_sar
 
 
 def test_get_reference_pixel():
@@ -67,3 +71,269 @@ def test_get_reference_pixel():
     array[4][3] = 1.0
     assert get_reference_pixel(array, window_size=(3, 3)) == (6, 4)
     assert get_reference_pixel(array, window_size=(5, 5)) == (0, 0)
+
+
+def test_get_reference_pixel_matches_generic_filter():
+    def sum_valid_coherence_values(array):
+        if (array < 0.3).any() or (array == 1.0).any():
+            return 0.0
+        return array.sum()
+
+    rng = np.random.default_rng(42)
+    for window_size in [(1, 1), (2, 3), (3, 3), (4, 4), (5, 5)]:
+        for array in [rng.random((20, 30)), np.round(rng.random((20, 30)), 1), rng.random((20, 30)).astype('>f4')]:
+            pixel_weights = scipy.ndimage.generic_filter(input=array, function=sum_valid_coherence_values,
+                                                         size=window_size, mode='constant', cval=0.0)
+            expected = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+            assert get_reference_pixel(array, window_size=window_size) == expected
+
+
+def test_get_reference_pixel_float32_near_tie():
+    def sum_valid_coherence_values(array):
+        if (array < 0.3).any() or (array == 1.0).any():
+            return 0.0
+        return array.sum()
+
+    # windows centered on columns 1 to 5 all sum to 2.1 in float32, but those centered on columns 3 to 5 sum to a
+    # little more in float64
+    coherence = np.full((1, 7), 0.7, dtype=np.float32)
+    coherence[0, 4] = np.nextafter(np.float32(0.7), np.float32(1.0))
+    pixel_weights = scipy.ndimage.generic_filter(input=coherence, function=sum_valid_coherence_values,
+                                                 size=(1, 3), mode='constant', cval=0.0)
+    assert pixel_weights[0, 1] == pixel_weights[0, 3]
+    assert np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape) == (0, 1)
+    assert get_reference_pixel(coherence, window_size=(1, 3)) == (0, 1)
+    assert get_reference_pixel(coherence.astype('>f4'), window_size=(1, 3)) == (0, 1)
+
+
+def test_find_max_weight_uniform_coherence():
+    def sum_valid_coherence_values(array):
+        if (array < 0.3).any() or (array == 1.0).any():
+            return 0.0
+        return array.sum()
+
+    # every valid window is a candidate for the exact re-sum, which is done in chunks
+    coherence = np.full((20, 30), 0.8, dtype='>f4')
+    coherence[10, 15] = np.nextafter(np.float32(0.8), np.float32(1.0))
+    for array in [coherence, coherence.astype(np.float64)]:
+        pixel_weights = scipy.ndimage.generic_filter(input=array, function=sum_valid_coherence_values,
+                                                     size=(3, 3), mode='constant', cval=0.0)
+        expected = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+        for chunk_size in [7, 65536]:
+            row, col, weight = unwrapping_geocoding._find_max_weight(array, (3, 3), 0.3, slice(None), slice(None),
+                                                                     chunk_size=chunk_size)
+            assert (row, col) == expected
+            assert weight == pixel_weights[expected]
+
+
+def test_get_reference_pixel_coarse_to_fine():
+    array = np.full((40, 60), 0.5)
+    array[20:30, 31:39] = 0.9
+    array[25, 35] = 0.95
+    assert get_reference_pixel(array, window_size=(3, 3)) == (24, 34)
+    assert get_reference_pixel(array, window_size=(3, 3), decimation=4) == (24, 34)
+
+    array = np.zeros((40, 60))
+    assert get_reference_pixel(array, window_size=(3, 3), decimation=4) == (0, 0)
+
+
+def test_map_water_mask_to_sar(tmp_path):
+    mask = np.array([
+        [1, 1, 0, 0],
+        [1, 1, 0, 1],
+        [1, 1, 1, 0],
+    ], dtype=np.uint8)
+    water_mask = str(tmp_path / 'water_mask.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(water_mask, 4, 3, 1, gdal.GDT_Byte)
+    ds.GetRasterBand(1).WriteArray(mask)
+    del ds
+
+    # range pixel + 1j * azimuth line of each MAP pixel; MAP pixel (2, 3) is outside the SAR image, so SAR pixel (2, 3)
+    # has nothing assigned to it
+    lookup_table = np.array([
+        [0.1 + 0.1j, 0.6 + 0.0j, 2.0 + 0.0j, 3.0 + 0.0j],
+        [0.0 + 1.0j, 1.4 + 0.9j, 2.0 + 1.0j, 3.0 + 1.0j],
+        [0.0 + 2.0j, 1.0 + 2.0j, 2.0 + 2.0j, 0.0 + 4.0j],
+    ], dtype='>c8')
+    lt = str(tmp_path / 'MAP2RDC')
+    lookup_table.tofile(lt)
+
+    expected = np.array([
+        [1, 1, 0, 0],
+        [1, 1, 0, 1],
+        [1, 1, 1, 1],
+    ], dtype=np.uint8)
+    assert np.array_equal(map_water_mask_to_sar(water_mask, lt, 4, 3, block_lines=2), expected)
+    out_file = str(tmp_path / 'water_mask_sar')
+    assert np.array_equal(map_water_mask_to_sar(water_mask, lt, 4, 3, block_lines=1, out_file=out_file), expected)
+    assert np.array_equal(np.fromfile(out_file, dtype=np.uint8).reshape(3, 4), expected)
+
+    expected[2, 3] = 0
+    assert np.array_equal(map_water_mask_to_sar(water_mask, lt, 4, 3, fill_distance=0), expected)
+
+    # MAP pixels outside the SAR image are 0+0j, and are not assigned to SAR pixel (0, 0)
+    ds = gdal.GetDriverByName('GTiff').Create(water_mask, 3, 1, 1, gdal.GDT_Byte)
+    ds.GetRasterBand(1).WriteArray(np.array([[0, 1, 1]], dtype=np.uint8))
+    del ds
+    np.array([[0.2 + 0.0j, 1.0 + 0.0j, 0.0 + 0.0j]], dtype='>c8').tofile(lt)
+    assert np.array_equal(map_water_mask_to_sar(water_mask, lt, 2, 1, fill_distance=0), np.array([[0, 1]]))
+
+
+def test_mask_coherence_and_validity(tmp_path):
+    coherence = (np.arange(1, 13).reshape(3, 4) / 12).astype('>f4')
+    cc_file = str(tmp_path / 'ifg.cc')
+    coherence.tofile(cc_file)
+
+    validity = np.array([
+        [1, 1, 0, 1],
+        [1, 2, 1, 1],
+        [0, 1, 1, 2],
+    ], dtype=np.uint8)
+    palette = [0, 0, 0, 255, 255, 255, 128, 128, 128] + [0] * 759
+    image = Image.fromarray(validity)
+    image.putpalette(palette)
+    cc_mask_file = str(tmp_path / 'ifg.adf.cc_mask.bmp')
+    image.save(cc_mask_file)
+
+    water_mask_sar = np.array([
+        [1, 1, 1, 0],
+        [1, 0, 1, 1],
+        [0, 1, 1, 1],
+    ], dtype=np.uint8)
+    cc_masked_file, combined_mask_file = unwrapping_geocoding.mask_coherence_and_validity(
+        cc_file, cc_mask_file, water_mask_sar, block_lines=2
+    )
+
+    assert cc_masked_file == f'{cc_file}_masked'
+    cc_masked = np.fromfile(cc_masked_file, dtype='>f4').reshape(3, 4)
+    assert np.array_equal(cc_masked, np.where(water_mask_sar == 0, 0, coherence))
+
+    assert combined_mask_file == str(tmp_path / 'combined_mask.bmp')
+    combined_mask = Image.open(combined_mask_file)
+    assert combined_mask.getpalette()[:9] == palette[:9]
+    assert np.array_equal(np.array(combined_mask), np.array([
+        [1, 1, 0, 0],
+        [1, 0, 1, 1],
+        [0, 1, 1, 2],
+    ]))
+    assert np.array_equal(np.array(Image.open(cc_mask_file)), validity)
+
+
+MCF_LOG = 'phase at reference point:  0.5000 radians\nphase initialization flag: 1 global offset: 0.0000 radians\n'
+
+
+def _prepare_unwrapping_geocoding_inputs(tmp_path, monkeypatch):
+    """Write the inputs of unwrapping_geocoding for a 3x4 pixel interferogram of reference `ref` and secondary `sec`,
+    and mock the GAMMA commands"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'DEM').mkdir()
+    (tmp_path / 'ref_sec.off.it').write_text('interferogram_width:  4\ninterferogram_azimuth_lines:  3\n')
+    (tmp_path / 'ref.mli.par').write_text('range_samples:  4\nazimuth_lines:  3\n')
+    (tmp_path / 'DEM' / 'demseg.par').write_text('width:  4\nnlines:  3\n')
+
+    # the MAP and SAR grids are the same
+    lines, samples = np.mgrid[0:3, 0:4]
+    (samples + 0.1 + 1j * (lines + 0.1)).astype('>c8').tofile(tmp_path / 'DEM' / 'MAP2RDC')
+    np.zeros((3, 4), dtype='>f4').tofile(tmp_path / 'DEM' / 'HGT_SAR_10_2')
+    np.full((3, 4), 0.8, dtype='>f4').tofile(tmp_path / 'ref_sec.cc')
+
+    def create_water_mask_from_gamma_par(dem_par, output_image):
+        ds = gdal.GetDriverByName('GTiff').Create(output_image, 4, 3, 1, gdal.GDT_Byte)
+        ds.GetRasterBand(1).WriteArray(np.array([[1, 1, 1, 0]] * 3, dtype=np.uint8))
+        del ds
+
+    commands = []
+
+    def execute(cmd, uselogging=False):
+        commands.append(cmd)
+        return MCF_LOG
+
+    monkeypatch.setattr(unwrapping_geocoding, 'execute', execute)
+    monkeypatch.setattr(unwrapping_geocoding, 'create_water_mask_from_gamma_par', create_water_mask_from_gamma_par)
+    monkeypatch.setattr(unwrapping_geocoding, 'get_coords', lambda *args, **kwargs: {})
+    return commands
+
+
+def test_unwrapping_geocoding_apply_water_mask(tmp_path, monkeypatch):
+    commands = _prepare_unwrapping_geocoding_inputs(tmp_path, monkeypatch)
+    image = Image.fromarray(np.ones((3, 4), dtype=np.uint8))
+    image.putpalette([0, 0, 0, 255, 255, 255] + [0] * 762)
+    image.save(tmp_path / 'ref_sec.adf.cc_mask.bmp')
+
+    _, ref_point_info = unwrapping_geocoding.unwrapping_geocoding('ref', 'sec', apply_water_mask=True)
+    assert ref_point_info == {'initflg': 1, 'refoffset': 0.5, 'glboffset': 0.0}
+
+    expected = np.array([[1, 1, 1, 0]] * 3)
+    assert np.array_equal(np.fromfile(tmp_path / 'water_mask_sar', dtype=np.uint8).reshape(3, 4), expected)
+    cc_masked = np.fromfile(tmp_path / 'ref_sec.cc_masked', dtype='>f4').reshape(3, 4)
+    assert np.array_equal(cc_masked, np.where(expected == 0, 0, np.float32(0.8)))
+    assert np.array_equal(np.array(Image.open(tmp_path / 'combined_mask.bmp')), expected)
+
+    mcf = [command for command in commands if command.startswith('mcf ')]
+    assert len(mcf) == 1
+    assert ' combined_mask.bmp ' in mcf[0]
+
+
+INCLUDE_OPTIONS = ['include_look_vectors', 'include_displacement_maps', 'include_wrapped_phase', 'include_inc_map',
+                   'include_dem']
+
+
+def _run_unwrapping_geocoding(tmp_path, monkeypatch, **include_options):
+    commands = _prepare_unwrapping_geocoding_inputs(tmp_path, monkeypatch)
+    geotiffs = []
+
+    def data2geotiff(inname, outname, dempar, type_):
+        geotiffs.append(outname)
+        (tmp_path / outname).touch()
+
+    monkeypatch.setattr(unwrapping_geocoding, 'geocode_back', lambda inname, outname, *args: commands.append(outname))
+    monkeypatch.setattr(unwrapping_geocoding, 'data2geotiff', data2geotiff)
+    unwrapping_geocoding.unwrapping_geocoding('ref', 'sec', **include_options)
+    return commands, geotiffs
+
+
+def test_unwrapping_geocoding_default_layers(tmp_path, monkeypatch):
+    commands, geotiffs = _run_unwrapping_geocoding(tmp_path, monkeypatch)
+
+    assert not [command for command in commands if command.split()[0] in ('dispmap', 'look_vector', 'gc_map2')]
+    assert sorted(geotiffs) == sorted([
+        'ref.mli.geo.tif',
+        'ref_sec.adf.unw.geo.tif',
+        'ref_sec.adf.unw.geo.bmp.tif',
+        'ref_sec.diff0.man.adf.bmp.geo.tif',
+        'ref_sec.cc.geo.tif',
+    ])
+
+
+def test_unwrapping_geocoding_include_layers(tmp_path, monkeypatch):
+    for option in [None] + INCLUDE_OPTIONS:
+        work_dir = tmp_path / str(option)
+        work_dir.mkdir()
+        include_options = {name: name == option for name in INCLUDE_OPTIONS}
+        _run_unwrapping_geocoding(work_dir, monkeypatch, **include_options)
+
+        browse_images = []
+
+        def make_asf_browse(geotiff, base_name, use_nn=False):
+            assert (work_dir / geotiff).is_file()
+            browse_images.append(geotiff)
+
+        monkeypatch.setattr(ifm_sentinel, 'makeAsfBrowse', make_asf_browse)
+        (work_dir / 'product').mkdir()
+        ifm_sentinel.move_output_files('ref_sec', 'ref', 'product', 'product', **include_options)
+        assert len(browse_images) == 2
+
+
+def test_main_include_options(monkeypatch):
+    calls = []
+    monkeypatch.setattr(unwrapping_geocoding, 'unwrapping_geocoding', lambda *args, **kwargs: calls.append(kwargs))
+
+    monkeypatch.setattr('sys.argv', ['unwrapping_geocoding.py', 'ref', 'sec'])
+    unwrapping_geocoding.main()
+    assert not any(calls[-1][option] for option in INCLUDE_OPTIONS)
+
+    monkeypatch.setattr('sys.argv', ['unwrapping_geocoding.py', 'ref', 'sec', '--include-look-vectors',
+                                     '--include-displacement-maps', '--include-wrapped-phase', '--include-inc-map',
+                                     '--include-dem'])
+    unwrapping_geocoding.main()
+    assert all(calls[-1][option] for option in INCLUDE_OPTIONS)
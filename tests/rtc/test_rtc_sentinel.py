@@ -1,8 +1,10 @@
 from os import chdir
 from re import match
 
+import numpy as np
 import pytest
-from hyp3lib import GranuleError
+from hyp3lib import ExecuteError, GranuleError
+from osgeo import gdal
 
 from hyp3_gamma.rtc import rtc_sentinel
 
@@ -122,3 +124,161 @@ def test_append_additional_log_files(tmp_path):
         '==============================================\n',
         'bar\n'
     ]
+
+
+def test_scale_power():
+    power = np.array([[0.0, 0.01, 1.0], [4.0, -1.0, 100.0]], dtype=np.float32)
+
+    assert rtc_sentinel.scale_power(power, 'power', 0.0) is power
+    assert np.allclose(rtc_sentinel.scale_power(power, 'amplitude', 0.0),
+                       [[0.0, 0.1, 1.0], [2.0, np.nan, 10.0]], equal_nan=True)
+
+    nodata = rtc_sentinel.DECIBEL_NODATA
+    assert np.allclose(rtc_sentinel.scale_power(power, 'decibel', 0.0),
+                       [[nodata, -20.0, 0.0], [10 * np.log10(4.0), nodata, 20.0]])
+    assert np.allclose(rtc_sentinel.scale_power(power, 'decibel', 100.0),
+                       [[nodata, -20.0, 0.0], [10 * np.log10(4.0), nodata, nodata]])
+
+
+def test_write_backscatter_tifs(tmp_path):
+    power = np.array([[0.0, 0.01, 1.0], [4.0, 9.0, 100.0], [0.25, 0.0, 1.0]], dtype=np.float32)
+    power_tif = str(tmp_path / 'power.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(power_tif, 3, 3, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform([440720.0, 30.0, 0.0, 3751320.0, 0.0, -30.0])
+    ds.SetMetadata({'AREA_OR_POINT': 'Point'})
+    ds.GetRasterBand(1).SetNoDataValue(0.0)
+    ds.GetRasterBand(1).WriteArray(power)
+    del ds
+
+    output_tif = str(tmp_path / 'output.tif')
+    amp_tif = str(tmp_path / 'amp.tif')
+    rtc_sentinel.write_backscatter_tifs(power_tif, output_tif, 'decibel', amp_tif, block_lines=2)
+
+    ds = gdal.Open(output_tif)
+    assert ds.GetGeoTransform() == (440720.0, 30.0, 0.0, 3751320.0, 0.0, -30.0)
+    assert ds.GetMetadata()['AREA_OR_POINT'] == 'Point'
+    assert ds.GetRasterBand(1).GetNoDataValue() == rtc_sentinel.DECIBEL_NODATA
+    assert np.array_equal(ds.GetRasterBand(1).ReadAsArray(), rtc_sentinel.scale_power(power, 'decibel', 0.0))
+    del ds
+
+    ds = gdal.Open(amp_tif)
+    assert ds.GetMetadata()['AREA_OR_POINT'] == 'Point'
+    assert ds.GetRasterBand(1).GetNoDataValue() == 0.0
+    assert np.array_equal(ds.GetRasterBand(1).ReadAsArray(), np.sqrt(power))
+    del ds
+
+    rtc_sentinel.write_backscatter_tifs(power_tif, output_tif, 'power')
+    ds = gdal.Open(output_tif)
+    assert ds.GetMetadata()['AREA_OR_POINT'] == 'Point'
+    assert ds.GetRasterBand(1).GetNoDataValue() == 0.0
+    assert np.array_equal(ds.GetRasterBand(1).ReadAsArray(), power)
+    del ds
+
+    ds = gdal.Open(power_tif, gdal.GA_Update)
+    ds.GetRasterBand(1).SetNoDataValue(4.0)
+    del ds
+    rtc_sentinel.write_backscatter_tifs(power_tif, output_tif, 'amplitude')
+    ds = gdal.Open(output_tif)
+    assert ds.GetRasterBand(1).GetNoDataValue() == 2.0
+    del ds
+
+
+def test_split_omp_threads():
+    assert rtc_sentinel.split_omp_threads(16) == (8, 8)
+    assert rtc_sentinel.split_omp_threads(7) == (4, 3)
+    assert rtc_sentinel.split_omp_threads(1) == (1, 1)
+
+
+def test_run(tmp_path):
+    chdir(tmp_path)
+    (tmp_path / 'vh_geocoding').mkdir()
+
+    rtc_sentinel.run('echo $OMP_NUM_THREADS > threads.txt', omp_threads=4)
+    assert (tmp_path / 'threads.txt').read_text() == '4\n'
+
+    rtc_sentinel.run('echo $OMP_NUM_THREADS > threads.txt', omp_threads=2, cwd='vh_geocoding')
+    assert (tmp_path / 'vh_geocoding' / 'threads.txt').read_text() == '2\n'
+    assert (tmp_path / 'threads.txt').read_text() == '4\n'
+
+    with pytest.raises(ExecuteError, match='^false: Nonzero return value: 1$'):
+        rtc_sentinel.run('false')
+    with pytest.raises(ExecuteError, match='^echo: ERROR: bad input$'):
+        rtc_sentinel.run('echo ERROR: bad input && echo done && exit 2')
+
+
+def test_copy_lookup_table(tmp_path):
+    chdir(tmp_path)
+    for name in ['corrected_1.map_to_rdc', 'corrected.diff_par', 'corrected_gamma0.pix', 'dem_seg', 'dem_seg.par',
+                 'vv.mli', 'dem.par']:
+        (tmp_path / name).write_text(name)
+
+    rtc_sentinel.copy_lookup_table('vh_geocoding')
+    work_dir = tmp_path / 'vh_geocoding'
+    assert sorted(path.name for path in work_dir.iterdir()) == [
+        'corrected.diff_par', 'corrected_1.map_to_rdc', 'corrected_gamma0.pix', 'dem_seg', 'dem_seg.par',
+    ]
+    assert (work_dir / 'corrected_1.map_to_rdc').samefile(tmp_path / 'corrected_1.map_to_rdc')
+    assert (work_dir / 'dem_seg').samefile(tmp_path / 'dem_seg')
+    assert not (work_dir / 'corrected_gamma0.pix').samefile(tmp_path / 'corrected_gamma0.pix')
+    assert (work_dir / 'corrected_gamma0.pix').read_text() == 'corrected_gamma0.pix'
+
+    rtc_sentinel.copy_lookup_table('vh_geocoding')
+    assert (work_dir / 'dem_seg').read_text() == 'dem_seg'
+
+
+def test_prepare_mli_image_from_slc(monkeypatch):
+    commands = []
+    slc_tabs = []
+
+    def mock_run(cmd, omp_threads=None):
+        commands.append(cmd)
+        if cmd.startswith('multi_look_ScanSAR'):
+            with open(cmd.split(' ')[1]) as f:
+                slc_tabs.append(f.read())
+
+    monkeypatch.setattr(rtc_sentinel, 'run', mock_run)
+    assert rtc_sentinel._prepare_mli_image_from_slc('granule.SAFE', 'vv', 'orbit.EOF', 4) == ('vv.mli', 'vv.mli.par')
+
+    assert len(commands) == 7
+    assert commands[-1].endswith(' vv.mli vv.mli.par 20 4')
+    assert sorted(cmd.split(' ')[0] for cmd in commands[:-1]) == ['S1_OPOD_vec'] * 3 + ['par_S1_SLC'] * 3
+
+    temp_dir = commands[-1].split(' ')[1].rsplit('/', 1)[0]
+    assert slc_tabs == [''.join(
+        f'{temp_dir}/swath{swath}.slc {temp_dir}/swath{swath}.slc.par {temp_dir}/swath{swath}.slc.tops.par\n'
+        for swath in (1, 2, 3)
+    )]
+
+
+def test_sample_lookup_table():
+    image = np.array([[0.0, 1.0, 2.0], [10.0, 11.0, 12.0]], dtype='>f4')
+    lookup_table = np.array([[0 + 0j, 0.5 + 0j, 2 + 1j], [1.5 + 0.5j, -0.1 + 0j, 2 + 1.01j]], dtype='>c8')
+    assert np.array_equal(rtc_sentinel.sample_lookup_table(image, lookup_table),
+                          [[0.0, 0.5, 12.0], [6.5, np.nan, np.nan]], equal_nan=True)
+
+
+def test_geocode_with_co_pol_normalization(tmp_path):
+    chdir(tmp_path)
+    with open('vh.mli.par', 'w') as f:
+        f.write('range_samples:   2\nazimuth_lines:   2\n')
+    np.array([[1.0, 2.0], [3.0, 0.5]], dtype='>f4').tofile('vh.mli')
+    np.array([[2.0, 8.0], [6.0, 0.0]], dtype='>f4').tofile('vv.mli')
+    np.array([[0 + 0j, 1 + 0j, 0 + 1j], [1 + 1j, 5 + 5j, 1 + 0j]], dtype='>c8').tofile('corrected_1.map_to_rdc')
+
+    ds = gdal.GetDriverByName('GTiff').Create('vv-power.tif', 3, 2, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform([440720.0, 30.0, 0.0, 3751320.0, 0.0, -30.0])
+    ds.SetMetadataItem('AREA_OR_POINT', 'Point')
+    ds.GetRasterBand(1).SetNoDataValue(0.0)
+    ds.GetRasterBand(1).WriteArray(np.array([[0.4, 0.8, 1.2], [0.5, 0.7, 0.0]], dtype=np.float32))
+    del ds
+
+    power_tif = rtc_sentinel.geocode_with_co_pol_normalization('vh.mli', 'vh.mli.par', 'vv.mli', 'vv-power.tif', 'vh',
+                                                               block_lines=1)
+    assert power_tif == 'vh-power.tif'
+
+    ds = gdal.Open(power_tif)
+    assert ds.GetGeoTransform() == (440720.0, 30.0, 0.0, 3751320.0, 0.0, -30.0)
+    assert ds.GetMetadataItem('AREA_OR_POINT') == 'Point'
+    assert ds.GetRasterBand(1).GetNoDataValue() == 0.0
+    assert np.allclose(ds.GetRasterBand(1).ReadAsArray(), [[0.2, 0.2, 0.6], [0.0, 0.0, 0.0]])
+    del ds
@@ -0,0 +1,45 @@
+from shapely import geometry
+
+from hyp3_gamma import antimeridian
+
+
+def test_wrap_dateline_not_crossing():
+    polygon = geometry.Polygon([(-154, 71), (-147, 71), (-146, 70), (-153, 69), (-154, 71)])
+    assert antimeridian.wrap_dateline(polygon) == polygon
+
+    polygon = geometry.Polygon([(150, 50), (155, 55), (-150, 55), (-155, 50), (150, 50)])
+    assert antimeridian.wrap_dateline(polygon) == polygon
+
+
+def test_wrap_dateline_jump():
+    polygon = geometry.Polygon([(-179, 50), (176, 51), (177, 52), (-179, 52), (-179, 50)])
+    wrapped = antimeridian.wrap_dateline(polygon)
+    assert wrapped.geom_type == 'MultiPolygon'
+    assert [list(part.exterior.coords) for part in wrapped.geoms] == [
+        [(176.0, 51.0), (177.0, 52.0), (180.0, 52.0), (180.0, 50.2), (176.0, 51.0)],
+        [(-180.0, 50.2), (-180.0, 52.0), (-179.0, 52.0), (-179.0, 50.0), (-180.0, 50.2)],
+    ]
+
+
+def test_wrap_dateline_beyond_180():
+    polygon = geometry.Polygon([(179, 10), (181, 10), (181, 11), (179, 11), (179, 10)])
+    wrapped = antimeridian.wrap_dateline(polygon)
+    assert wrapped.geom_type == 'MultiPolygon'
+    assert [part.bounds for part in wrapped.geoms] == [(179.0, 10.0, 180.0, 11.0), (-180.0, 10.0, -179.0, 11.0)]
+
+    polygon = geometry.Polygon([(-181, 10), (-179, 10), (-179, 11), (-181, 11), (-181, 10)])
+    wrapped = antimeridian.wrap_dateline(polygon)
+    assert [part.bounds for part in wrapped.geoms] == [(-180.0, 10.0, -179.0, 11.0), (179.0, 10.0, 180.0, 11.0)]
+
+    polygon = geometry.Polygon([(190, 10), (191, 10), (191, 11), (190, 11), (190, 10)])
+    assert antimeridian.wrap_dateline(polygon).bounds == (-170.0, 10.0, -169.0, 11.0)
+
+
+def test_wrap_dateline_multipolygon():
+    multipolygon = geometry.MultiPolygon([
+        geometry.Polygon([(179, 10), (181, 10), (181, 11), (179, 11), (179, 10)]),
+        geometry.Polygon([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]),
+    ])
+    wrapped = antimeridian.wrap_dateline(multipolygon)
+    assert len(wrapped.geoms) == 3
+    assert wrapped.geoms[2] == multipolygon.geoms[1]
@@ -0,0 +1,58 @@
+import os
+import time
+
+from hyp3_gamma.cache import FileCache
+
+
+def write_file(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    return path
+
+
+def test_get_and_put(tmp_path):
+    cache = FileCache(tmp_path / 'cache', max_bytes=100)
+    assert cache.get('a/b.tif') is None
+
+    with cache.temporary_directory() as temp_dir:
+        assert temp_dir.parent == tmp_path / 'cache'
+        new_file = write_file(temp_dir / 'download.tif', 10)
+        path = cache.put('a/b.tif', new_file)
+        assert not new_file.exists()
+
+    assert path == tmp_path / 'cache' / 'a' / 'b.tif'
+    assert path.read_bytes() == b'x' * 10
+    assert cache.get('a/b.tif') == path
+    assert [p.name for p in (tmp_path / 'cache').iterdir() if not p.name.startswith('.')] == ['a']
+
+
+def test_get_marks_recently_used(tmp_path):
+    cache = FileCache(tmp_path, max_bytes=100)
+    path = write_file(tmp_path / 'a.tif', 10)
+    os.utime(path, (0, 0))
+
+    cache.get('a.tif')
+    assert path.stat().st_mtime > time.time() - 60
+
+
+def test_evict(tmp_path):
+    cache = FileCache(tmp_path, max_bytes=25, min_age=0)
+    now = time.time()
+    for age, name in enumerate(['d.tif', 'c.tif', 'b.tif', 'a.tif']):
+        os.utime(write_file(tmp_path / 'tiles' / name, 10), (now - age, now - age))
+    write_file(tmp_path / '.incoming-foo' / 'e.tif', 10)
+
+    cache.evict()
+    assert sorted(p.name for p in (tmp_path / 'tiles').iterdir()) == ['c.tif', 'd.tif']
+    assert (tmp_path / '.incoming-foo' / 'e.tif').exists()
+
+
+def test_evict_keeps_recently_used(tmp_path):
+    cache = FileCache(tmp_path, max_bytes=5, min_age=3600)
+    now = time.time()
+    os.utime(write_file(tmp_path / 'old.tif', 10), (now - 7200, now - 7200))
+    write_file(tmp_path / 'new.tif', 10)
+
+    cache.evict()
+    assert not (tmp_path / 'old.tif').exists()
+    assert (tmp_path / 'new.tif').exists()
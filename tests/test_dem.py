@@ -1,5 +1,6 @@
 import json
 
+import numpy as np
 import pytest
 from hyp3lib import DemError
 from osgeo import gdal, ogr
@@ -94,6 +95,74 @@ def test_get_file_paths():
         'Copernicus_DSM_COG_10_S46_00_E169_00_DEM/Copernicus_DSM_COG_10_S46_00_E169_00_DEM.tif']
 
 
+def test_get_dem_index(tmp_path, monkeypatch):
+    monkeypatch.setenv('HYP3_GAMMA_CACHE_DIR', str(tmp_path))
+    dem.get_dem_index.cache_clear()
+
+    tile_index = dem.get_dem_index()
+    index_path = tmp_path / 'dem_index' / f'cop30-2021-with-cop90-us-west-2-mirror.v{dem.DEM_INDEX_VERSION}.npz'
+    assert dem.get_dem_index_name() == index_path.name
+    assert index_path.exists()
+    assert dem.get_dem_index() is tile_index
+    assert len(tile_index.bounds) == len(tile_index.file_paths) == len(tile_index.wkb_offsets) - 1
+
+    geojson = {
+        'type': 'MultiPolygon',
+        'coordinates': [
+            [[[179.5, 51.4], [179.5, 51.6], [180.0, 51.6], [180.0, 51.4], [179.5, 51.4]]],
+            [[[-180.0, 51.4], [-180.0, 51.6], [-179.5, 51.6], [-179.5, 51.4], [-180.0, 51.4]]],
+        ],
+    }
+    geometry = ogr.CreateGeometryFromJson(json.dumps(geojson))
+    assert sorted(tile_index.query(geometry)) == [
+        '/vsicurl/https://asf-dem-west.s3.amazonaws.com/v2/COP30/2021/'
+        'Copernicus_DSM_COG_10_N51_00_E179_00_DEM/Copernicus_DSM_COG_10_N51_00_E179_00_DEM.tif',
+        '/vsicurl/https://asf-dem-west.s3.amazonaws.com/v2/COP30/2021/'
+        'Copernicus_DSM_COG_10_N51_00_W180_00_DEM/Copernicus_DSM_COG_10_N51_00_W180_00_DEM.tif',
+    ]
+
+    dem.get_dem_index.cache_clear()
+    assert dem.get_dem_index().query(geometry) == tile_index.query(geometry)
+    dem.get_dem_index.cache_clear()
+
+    with np.load(index_path) as index_file:
+        with open(index_path, 'wb') as f:
+            np.savez(f, **dict(index_file, version=np.array(0)))
+    with pytest.raises(ValueError):
+        dem.DemTileIndex(index_path)
+
+
+def test_get_file_paths_from_tile_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('HYP3_GAMMA_DEM_TILE_CACHE_BYTES', str(2 ** 30))
+    monkeypatch.setenv('HYP3_GAMMA_CACHE_DIR', str(tmp_path))
+    dem.get_dem_index.cache_clear()
+
+    geojson = {
+        'type': 'MultiPoint',
+        'coordinates': [[169, -45], [-121.5, 73.5]]
+    }
+    geometry = ogr.CreateGeometryFromJson(json.dumps(geojson))
+
+    cached_tile = tmp_path / 'dem_tiles' / 'v2' / 'COP30' / '2021' / 'Copernicus_DSM_COG_10_S46_00_E169_00_DEM' / \
+        'Copernicus_DSM_COG_10_S46_00_E169_00_DEM.tif'
+    cached_tile.parent.mkdir(parents=True)
+    cached_tile.touch()
+
+    assert dem.get_dem_file_paths(geometry) == [
+        '/vsicurl/https://asf-dem-west.s3.amazonaws.com/v2/COP30/2021/'
+        'Copernicus_DSM_COG_10_N73_00_W122_00_DEM/Copernicus_DSM_COG_10_N73_00_W122_00_DEM.tif',
+        str(cached_tile),
+    ]
+    dem.get_dem_index.cache_clear()
+
+
+def test_get_tile_cache_key():
+    file_path = '/vsicurl/https://asf-dem-west.s3.amazonaws.com/v2/COP30/2021/' \
+                'Copernicus_DSM_COG_10_S46_00_E169_00_DEM/Copernicus_DSM_COG_10_S46_00_E169_00_DEM.tif'
+    assert dem.get_tile_cache_key(file_path) == \
+        'v2/COP30/2021/Copernicus_DSM_COG_10_S46_00_E169_00_DEM/Copernicus_DSM_COG_10_S46_00_E169_00_DEM.tif'
+
+
 def test_utm_from_lon_lat():
     assert dem.utm_from_lon_lat(0, 0) == 32631
     assert dem.utm_from_lon_lat(-179, -1) == 32701
@@ -148,8 +217,7 @@ def test_shift_for_antimeridian(tmp_path):
     with dem.GDALConfigManager(GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'):
         shifted_file_paths = dem.shift_for_antimeridian(file_paths, tmp_path)
 
-    assert shifted_file_paths[0] == str(tmp_path / 'Copernicus_DSM_COG_10_N51_00_W180_00_DEM.vrt')
-    assert shifted_file_paths[1] == file_paths[1]
+    assert shifted_file_paths == [str(tmp_path / 'antimeridian_west.vrt'), file_paths[1]]
 
     info = gdal.Info(shifted_file_paths[0], format='json')
     assert info['cornerCoordinates']['upperLeft'] == [179.9997917, 52.0001389]
@@ -217,3 +285,135 @@ def test_prepare_dem_geotiff_antimeridian(tmp_path):
     info = gdal.Info(str(dem_geotiff), format='json')
     assert info['geoTransform'] == [219330.0, 30.0, 0.0, 5768640.0, 0.0, -30.0]
     assert info['size'] == [4780, 3897]
+
+
+def test_get_snapped_bounds():
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((0.4 10.16, 0.4 10.86, 0.6 10.86, 0.6 10.16, 0.4 10.16))')
+    assert dem.get_snapped_bounds(geometry) == (0, 10, 1, 11)
+
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((-154 71, -147 71, -146 70, -153 69, -154 71))')
+    assert dem.get_snapped_bounds(geometry) == (-154, 69, -146, 71)
+
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((-0.5 -0.5, -0.5 0.5, 0.5 0.5, 0.5 -0.5, -0.5 -0.5))')
+    assert dem.get_snapped_bounds(geometry) == (-1, -1, 1, 1)
+
+
+def test_prepare_dem_geotiff_from_mosaic_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('HYP3_GAMMA_DEM_MOSAIC_CACHE_BYTES', str(2 ** 30))
+    monkeypatch.setenv('HYP3_GAMMA_CACHE_DIR', str(tmp_path / 'cache'))
+    dem.get_dem_index.cache_clear()
+
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((0.4 10.16, 0.4 10.86, 0.6 10.86, 0.6 10.16, 0.4 10.16))')
+    dem.prepare_dem_geotiff(str(tmp_path / 'dem1.tif'), geometry, pixel_size=60)
+
+    mosaic_dir = tmp_path / 'cache' / 'dem_mosaics' / 'cop30-2021-with-cop90-us-west-2-mirror' / 'EPSG32631' / '60m'
+    assert [mosaic.name for mosaic in mosaic_dir.iterdir()] == ['0_10_1_12.tif']
+
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((0.45 10.2, 0.45 10.8, 0.55 10.8, 0.55 10.2, 0.45 10.2))')
+    dem.prepare_dem_geotiff(str(tmp_path / 'dem2.tif'), geometry, pixel_size=60)
+    assert [mosaic.name for mosaic in mosaic_dir.iterdir()] == ['0_10_1_12.tif']
+
+    mosaic_info = gdal.Info(str(mosaic_dir / '0_10_1_12.tif'), format='json')
+    for dem_geotiff in ('dem1.tif', 'dem2.tif'):
+        info = gdal.Info(str(tmp_path / dem_geotiff), format='json')
+        assert info['geoTransform'][0] % 60 == 0
+        assert info['geoTransform'][3] % 60 == 0
+        assert info['size'][0] < mosaic_info['size'][0]
+        assert info['size'][1] < mosaic_info['size'][1]
+    dem.get_dem_index.cache_clear()
+
+
+def test_warp_in_windows(tmp_path):
+    source = str(tmp_path / 'source.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(source, 200, 150, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform([-122.5, 0.001, 0, 45.2, 0, -0.001])
+    ds.SetProjection('EPSG:4326')
+    ds.GetRasterBand(1).Fill(0)
+    ds.GetRasterBand(1).WriteRaster(20, 30, 2, 2, b'\x00\x00\xc8\x42' * 4)
+    del ds
+
+    warp_options = dict(dstSRS='EPSG:32610', xRes=30.0, yRes=30.0, targetAlignedPixels=True, resampleAlg='cubic')
+    expected = str(tmp_path / 'expected.tif')
+    gdal.Warp(expected, source, errorThreshold=0, **warp_options)
+
+    output = str(tmp_path / 'output.tif')
+    dem.warp_in_windows(output, source, processes=3, **warp_options)
+
+    expected_ds = gdal.Open(expected)
+    output_ds = gdal.Open(output)
+    assert output_ds.GetGeoTransform() == expected_ds.GetGeoTransform()
+    assert output_ds.ReadRaster() == expected_ds.ReadRaster()
+
+
+def test_write_gamma_dem(tmp_path):
+    geoid = tmp_path / 'geoid.dem'
+    geoid_par = tmp_path / 'geoid.dem_par'
+    np.full((181, 360), 10.0, dtype='>f4').tofile(geoid)
+    geoid_par.write_text(
+        'Gamma DIFF&GEO DEM/MAP parameter file\n'
+        'DEM_projection:     EQA\n'
+        'data_format:        REAL*4\n'
+        'width:                 360\n'
+        'nlines:                181\n'
+        'corner_lat:     90.0000000  decimal degrees\n'
+        'corner_lon:      0.0000000  decimal degrees\n'
+        'post_lat:     -1.0000000e+00  decimal degrees\n'
+        'post_lon:      1.0000000e+00  decimal degrees\n'
+    )
+
+    dem_tif = str(tmp_path / 'dem.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(dem_tif, 5, 3, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform([171000.0, 60.0, 0.0, 1328400.0, 0.0, -60.0])
+    ds.SetProjection('EPSG:32631')
+    ds.GetRasterBand(1).SetNoDataValue(-9999.0)
+    data = np.arange(15, dtype=np.float32).reshape(3, 5)
+    data[2, 4] = -9999.0
+    ds.GetRasterBand(1).WriteArray(data)
+    del ds
+
+    dem_image = str(tmp_path / 'dem.image')
+    dem_par = str(tmp_path / 'dem.par')
+    dem.write_gamma_dem(dem_tif, dem_image, dem_par, geoid=str(geoid), geoid_par=str(geoid_par), block_lines=2)
+
+    expected = data + 10.0
+    expected[2, 4] = 0.0
+    assert np.array_equal(np.fromfile(dem_image, dtype='>f4').reshape(3, 5), expected)
+
+    parameters = dem.read_gamma_par(dem_par)
+    assert parameters['DEM_projection'] == 'UTM'
+    assert parameters['data_format'] == 'REAL*4'
+    assert parameters['width'] == '5'
+    assert parameters['nlines'] == '3'
+    assert float(parameters['corner_north']) == 1328370.0
+    assert float(parameters['corner_east']) == 171030.0
+    assert float(parameters['post_north']) == -60.0
+    assert float(parameters['post_east']) == 60.0
+    assert parameters['projection_zone'] == '31'
+    assert float(parameters['false_northing']) == 0.0
+    assert float(parameters['center_longitude']) == 3.0
+
+
+def test_get_gamma_dem_grid(tmp_path):
+    dem_par = str(tmp_path / 'dem.par')
+    dem.write_gamma_dem_par(dem_par, 'dem', 5, 3, 5328370.0, 171030.0, -60.0, 60.0, -31)
+
+    width, nlines, geotransform, srs = dem.get_gamma_dem_grid(dem_par)
+    assert (width, nlines) == (5, 3)
+    assert geotransform == (171000.0, 60.0, 0.0, 5328400.0, 0.0, -60.0)
+    assert srs.GetAuthorityCode(None) == '32731'
+
+    with open(dem_par, 'w') as f:
+        f.write('DEM_projection: PS\nwidth: 5\nnlines: 3\n')
+    with pytest.raises(DemError):
+        dem.get_gamma_dem_grid(dem_par)
+
+
+def test_get_overview_factor():
+    ds = gdal.GetDriverByName('MEM').Create('', 10, 10, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform([169.0, 1 / 3600, 0.0, -45.0, 0.0, -1 / 3600])
+
+    assert dem.get_overview_factor(ds, 30.0) == 1
+    assert dem.get_overview_factor(ds, 60.0) == 1
+    assert dem.get_overview_factor(ds, 80.0) == 2
+    assert dem.get_overview_factor(ds, 160.0) == 4
+    assert dem.get_overview_factor(ds, 500.0) == 16
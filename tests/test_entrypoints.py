@@ -47,3 +47,18 @@ def test_interf_pwr_s1_lt_tops_proc(script_runner):
 def test_unwrapping_geocoding(script_runner):
     ret = script_runner.run('unwrapping_geocoding.py', '-h')
     assert ret.success
+
+
+def test_refresh_dem_index(script_runner):
+    ret = script_runner.run('refresh_dem_index', '-h')
+    assert ret.success
+
+
+def test_build_water_mask_pyramid(script_runner):
+    ret = script_runner.run('build_water_mask_pyramid', '-h')
+    assert ret.success
+
+
+def test_import_water_mask(script_runner):
+    ret = script_runner.run('import_water_mask', '-h')
+    assert ret.success
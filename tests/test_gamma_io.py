@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from hyp3_gamma import gamma_io
+
+
+def test_read_gamma_par(tmp_path):
+    par_file = tmp_path / 'image.mli.par'
+    par_file.write_text(
+        'Gamma Interferometric SAR Processor (ISP) - Image Parameter File\n'
+        '\n'
+        'title:     S1A_IW_SLC__1SDV\n'
+        'image_format:               FLOAT\n'
+        'range_samples:                 4\n'
+        'azimuth_lines:                 3\n'
+        'range_pixel_spacing:          46.591240   m\n'
+    )
+    assert gamma_io.read_gamma_par(par_file) == {
+        'title': 'S1A_IW_SLC__1SDV',
+        'image_format': 'FLOAT',
+        'range_samples': '4',
+        'azimuth_lines': '3',
+        'range_pixel_spacing': '46.591240',
+    }
+    assert gamma_io.get_raster_shape(par_file) == (3, 4)
+    assert gamma_io.get_raster_dtype(par_file) == gamma_io.FLOAT
+
+
+def test_get_raster_shape(tmp_path):
+    dem_par = tmp_path / 'dem.par'
+    dem_par.write_text('data_format:        INTEGER*2\nwidth:  5\nnlines:  2\n')
+    assert gamma_io.get_raster_shape(dem_par) == (2, 5)
+    assert gamma_io.get_raster_dtype(dem_par) == gamma_io.SHORT
+
+    off_par = tmp_path / 'ifg.off'
+    off_par.write_text('interferogram_width:  7\ninterferogram_azimuth_lines:  6\n')
+    assert gamma_io.get_raster_shape(off_par) == (6, 7)
+    with pytest.raises(ValueError):
+        gamma_io.get_raster_dtype(off_par)
+
+    other_par = tmp_path / 'other.par'
+    other_par.write_text('title: other\n')
+    with pytest.raises(ValueError):
+        gamma_io.get_raster_shape(other_par)
+
+
+def test_open_raster(tmp_path):
+    par_file = tmp_path / 'image.mli.par'
+    par_file.write_text('image_format: FLOAT\nrange_samples: 4\nazimuth_lines: 3\n')
+    data = np.arange(12, dtype='>f4').reshape(3, 4)
+    data.tofile(tmp_path / 'image.mli')
+
+    raster = gamma_io.open_raster(tmp_path / 'image.mli', par_file)
+    assert raster.dtype == np.dtype('>f4')
+    assert raster[2, 1] == 9.0
+    assert np.array_equal(raster[1:], data[1:])
+    with pytest.raises(ValueError):
+        raster[0, 0] = 1.0
+
+    complex_data = np.array([[1 + 2j, 3 - 4j]], dtype='>c8')
+    complex_data.tofile(tmp_path / 'lookup_table')
+    raster = gamma_io.open_raster(tmp_path / 'lookup_table', shape=(1, 2), dtype='FCOMPLEX')
+    assert np.array_equal(raster, complex_data)
+
+    with pytest.raises(ValueError):
+        gamma_io.open_raster(tmp_path / 'image.mli')
+
+
+def test_create_raster_and_iter_blocks(tmp_path):
+    raster = gamma_io.create_raster(tmp_path / 'image', (5, 2))
+    for lines, block in gamma_io.iter_blocks(raster, block_lines=2):
+        block[:] = lines.start
+    raster.flush()
+    del raster
+
+    data = np.fromfile(tmp_path / 'image', dtype='>f4').reshape(5, 2)
+    assert np.array_equal(data[:, 0], [0.0, 0.0, 2.0, 2.0, 4.0])
+
+    blocks = list(gamma_io.iter_blocks(data, block_lines=2))
+    assert [lines for lines, _ in blocks] == [slice(0, 2), slice(2, 4), slice(4, 5)]
+    assert [block.shape for _, block in blocks] == [(2, 2), (2, 2), (1, 2)]
+
+
+def test_par_file(tmp_path):
+    par_file = tmp_path / 'image.mli.par'
+    par_file.write_text(
+        'title:     S1A_IW_SLC__1SDV\n'
+        'range_samples:                 4\n'
+        'range_pixel_spacing:          46.591240   m\n'
+        'heading:                     -167.1234560   degrees\n'
+        'range_offset_polynomial:    -3.00000  1.0000e-02  0.0000e+00\n'
+        'range_samples:                 5\n'
+    )
+    parameters = gamma_io.ParFile(par_file)
+    assert parameters['range_pixel_spacing'] == '46.591240   m'
+    assert parameters.get('title') == 'S1A_IW_SLC__1SDV'
+    assert parameters.get_int('range_samples') == 5
+    assert parameters.get_float('heading') == -167.123456
+    assert parameters.get_units('heading') == 'degrees'
+    assert parameters.get_units('range_samples') is None
+    assert parameters.get_units('title') is None
+    assert parameters.get_float('range_offset_polynomial', 1) == 0.01
+    assert parameters.get_floats('range_offset_polynomial') == [-3.0, 0.01, 0.0]
+    assert 'azimuth_lines' not in parameters
+    with pytest.raises(KeyError, match='azimuth_lines'):
+        parameters.get('azimuth_lines')
+
+
+def test_read_par_file(tmp_path):
+    par_file = tmp_path / 'dem.par'
+    par_file.write_text('width:  5\nnlines:  2\n')
+    parameters = gamma_io.read_par_file(par_file)
+    assert gamma_io.read_par_file(str(par_file)) is parameters
+
+    par_file.write_text('width:  50\nnlines:  20\n')
+    parameters = gamma_io.read_par_file(par_file)
+    assert parameters.get_int('width') == 50
+    assert gamma_io.read_par_file(par_file) is parameters
+
+
+def test_open_bmp(tmp_path):
+    pixels = np.arange(15, dtype=np.uint8).reshape(3, 5)
+    bmp = tmp_path / 'mask.bmp'
+    image = Image.fromarray(pixels)
+    image.putpalette(list(range(256)) * 3)
+    image.save(bmp)
+    assert np.array_equal(gamma_io.open_bmp(bmp), pixels)
+
+    view = gamma_io.open_bmp(bmp, mode='r+')
+    view[1, 1:3] = 0
+    view.flush()
+    del view
+    pixels[1, 1:3] = 0
+    assert np.array_equal(np.array(Image.open(bmp)), pixels)
+
+    not_bmp = tmp_path / 'mask.tif'
+    Image.fromarray(pixels).save(not_bmp)
+    with pytest.raises(ValueError):
+        gamma_io.open_bmp(not_bmp)
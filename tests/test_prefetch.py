@@ -0,0 +1,85 @@
+from threading import Event, Thread
+
+import pytest
+from shapely import geometry
+
+from hyp3_gamma import prefetch
+
+
+class MockResponse:
+    def __init__(self, features):
+        self.features = features
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'type': 'FeatureCollection', 'features': self.features}
+
+
+def test_get_granule_footprint(monkeypatch):
+    polygon = {
+        'type': 'Polygon',
+        'coordinates': [[[10.0, 50.0], [11.0, 50.0], [11.0, 51.0], [10.0, 51.0], [10.0, 50.0]]],
+    }
+    monkeypatch.setattr(prefetch.requests, 'get', lambda url, params, timeout: MockResponse([{'geometry': polygon}]))
+    assert prefetch.get_granule_footprint('foo') == polygon
+
+    crossing = {
+        'type': 'Polygon',
+        'coordinates': [[[179.0, 51.0], [-179.0, 51.0], [-179.0, 52.0], [179.0, 52.0], [179.0, 51.0]]],
+    }
+    monkeypatch.setattr(prefetch.requests, 'get', lambda url, params, timeout: MockResponse([{'geometry': crossing}]))
+    footprint = prefetch.get_granule_footprint('foo')
+    assert footprint['type'] == 'MultiPolygon'
+    assert geometry.shape(footprint).bounds == (-180.0, 51.0, 180.0, 52.0)
+
+    monkeypatch.setattr(prefetch.requests, 'get', lambda url, params, timeout: MockResponse([]))
+    with pytest.raises(ValueError):
+        prefetch.get_granule_footprint('foo')
+
+
+def test_get_granule_footprint_timeout(monkeypatch):
+    def get(url, params, timeout):
+        assert timeout == prefetch.SEARCH_TIMEOUT
+        raise prefetch.requests.Timeout()
+
+    monkeypatch.setattr(prefetch.requests, 'get', get)
+    with pytest.raises(prefetch.requests.Timeout):
+        prefetch.get_granule_footprint('foo')
+
+
+def test_join_prefetch(caplog):
+    done = Event()
+    thread = Thread(target=done.wait, daemon=True)
+    thread.start()
+    prefetch.join_prefetch(thread, timeout=0.01)
+    assert thread.is_alive()
+    assert 'continuing without it' in caplog.text
+
+    caplog.clear()
+    done.set()
+    prefetch.join_prefetch(thread, timeout=10)
+    assert not thread.is_alive()
+    assert caplog.text == ''
+
+
+def test_buffer_footprint():
+    footprint = {
+        'type': 'Polygon',
+        'coordinates': [[[10.0, 50.0], [11.0, 50.0], [11.0, 51.0], [10.0, 51.0], [10.0, 50.0]]],
+    }
+    buffered = prefetch.buffer_footprint(footprint, 0.5)
+    assert buffered['type'] == 'Polygon'
+    assert geometry.shape(buffered).bounds == pytest.approx((9.5, 49.5, 11.5, 51.5))
+
+    footprint = {
+        'type': 'MultiPolygon',
+        'coordinates': [
+            [[[179.0, 51.0], [180.0, 51.0], [180.0, 52.0], [179.0, 52.0], [179.0, 51.0]]],
+            [[[-180.0, 51.0], [-179.0, 51.0], [-179.0, 52.0], [-180.0, 52.0], [-180.0, 51.0]]],
+        ],
+    }
+    buffered = prefetch.buffer_footprint(footprint, 0.5)
+    assert buffered['type'] == 'MultiPolygon'
+    assert geometry.shape(buffered).bounds == pytest.approx((-180.0, 50.5, 180.0, 52.5))
@@ -31,6 +31,15 @@ def test_gdal_config_manager():
     assert gdal.GetConfigOption('OPTION4') == 'VALUE4'
 
 
+def test_get_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('HYP3_GAMMA_CACHE_DIR', str(tmp_path / 'cache'))
+    assert util.get_cache_dir() == tmp_path / 'cache'
+
+    monkeypatch.delenv('HYP3_GAMMA_CACHE_DIR')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert util.get_cache_dir() == tmp_path / 'hyp3_gamma'
+
+
 def test_earlier_granule_first():
     a = 'S1A_EW_GRDM_1SSH_20141112T235735_20141112T235835_003255_003C39_913F'
     b = 'S1A_EW_GRDM_1SSH_20141112T235835_20141112T235935_003255_003C39_D8E7'
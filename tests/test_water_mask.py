@@ -1,7 +1,11 @@
+import json
+
+import geopandas as gpd
 import numpy as np
 from osgeo import gdal, osr
+from shapely import geometry
 
-from hyp3_gamma import water_mask
+from hyp3_gamma import dem, water_mask
 
 gdal.UseExceptions()
 
@@ -122,3 +126,155 @@ def test_create_water_mask_with_water_and_land(tmp_path, test_data_dir):
     ])
     assert np.array_equal(data, expected)
     del ds
+
+
+def test_create_water_mask_from_gamma_par(tmp_path, test_data_dir):
+    dem_par = str(tmp_path / 'demseg.par')
+    dem.write_gamma_dem_par(dem_par, 'demseg', 10, 10, 1756880.0, 200400.0, -80.0, 80.0, 15)
+    output_tif = str(tmp_path / 'water_mask.tif')
+    water_mask.create_water_mask_from_gamma_par(dem_par, output_tif)
+
+    expected_tif = str(tmp_path / 'expected_water_mask.tif')
+    water_mask.create_water_mask(str(test_data_dir / 'water_mask_input.tif'), expected_tif)
+
+    info = gdal.Info(output_tif, format='json')
+    expected_info = gdal.Info(expected_tif, format='json')
+    assert info['size'] == expected_info['size']
+    assert info['geoTransform'] == expected_info['geoTransform']
+    assert info['metadata']['']['AREA_OR_POINT'] == 'Point'
+    assert osr.SpatialReference(info['coordinateSystem']['wkt']).GetAuthorityCode(None) == '32615'
+
+    ds = gdal.Open(output_tif)
+    expected_ds = gdal.Open(expected_tif)
+    assert np.array_equal(ds.GetRasterBand(1).ReadAsArray(), expected_ds.GetRasterBand(1).ReadAsArray())
+    del ds, expected_ds
+
+
+def test_create_water_mask_from_pyramid(tmp_path, monkeypatch):
+    land = tmp_path / 'land.geojson'
+    land.write_text(json.dumps({
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'properties': {},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[0.0, 0.0], [0.505, 0.0], [0.505, 1.0], [0.0, 1.0], [0.0, 0.0]]],
+            },
+        }],
+    }))
+    pyramid = tmp_path / 'pyramid'
+    water_mask.build_water_mask_pyramid(str(land), pyramid, bounds=(0, 0, 2, 1))
+
+    assert (pyramid / '1as' / 'N00E000.tif').exists()
+    assert not (pyramid / '1as' / 'N00E001.tif').exists()
+    for resolution in water_mask.WATER_MASK_PYRAMID_RESOLUTIONS:
+        info = gdal.Info(str(pyramid / f'water_mask_{resolution}as.vrt'), format='json')
+        assert info['size'] == [2 * 3600 // resolution, 3600 // resolution]
+
+    input_tif = str(tmp_path / 'input.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(input_tif, 100, 100)
+    ds.SetGeoTransform([0.0, 0.01, 0.0, 1.0, 0.0, -0.01])
+    ds.SetProjection(osr.SRS_WKT_WGS84_LAT_LONG)
+    del ds
+
+    monkeypatch.setenv('HYP3_GAMMA_WATER_MASK_PYRAMID', str(pyramid))
+    output_tif = str(tmp_path / 'water_mask.tif')
+    water_mask.create_water_mask(input_tif, output_tif)
+
+    ds = gdal.Open(output_tif)
+    data = ds.GetRasterBand(1).ReadAsArray()
+    assert np.all(data[:, :50] == 1)
+    assert np.all(data[:, 52:] == 0)
+    del ds
+
+
+def test_rasterize_polygons():
+    dst_ds = gdal.GetDriverByName('MEM').Create('', 4, 4, 1, gdal.GDT_Byte)
+    dst_ds.SetGeoTransform([0.0, 1.0, 0.0, 4.0, 0.0, -1.0])
+    dst_ds.SetProjection(osr.SRS_WKT_WGS84_LAT_LONG)
+
+    polygons = gpd.GeoDataFrame(geometry=[geometry.box(0.5, 2.5, 1.5, 3.5)], crs='EPSG:4326')
+    water_mask.rasterize_polygons(dst_ds, polygons)
+
+    assert np.array_equal(dst_ds.GetRasterBand(1).ReadAsArray(), np.array([
+        [1, 1, 0, 0],
+        [1, 1, 0, 0],
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+    ]))
+
+
+def test_read_simplified_water_mask(monkeypatch):
+    coastline = [(x / 1000, 0.5 + (x % 2) * 1e-5) for x in range(1001)] + [(1.0, 1.0), (0.0, 1.0)]
+    polygons = gpd.GeoDataFrame(geometry=[geometry.Polygon(coastline)], crs='EPSG:4326')
+    calls = []
+
+    def mock_read_water_mask(envelope_gdf_wgs84):
+        calls.append(envelope_gdf_wgs84)
+        return polygons
+
+    monkeypatch.setattr(water_mask, 'read_water_mask', mock_read_water_mask)
+    water_mask.read_simplified_water_mask.cache_clear()
+
+    envelope = geometry.box(0, 0, 1, 1).wkb
+    mask = water_mask.read_simplified_water_mask(envelope, 1e-4)
+    assert len(mask.geometry[0].exterior.coords) == 5
+    assert mask.geometry[0].hausdorff_distance(polygons.geometry[0]) <= 1e-4
+
+    assert water_mask.read_simplified_water_mask(envelope, 1e-4) is mask
+    assert len(calls) == 1
+    water_mask.read_simplified_water_mask.cache_clear()
+
+
+def test_prefetch_water_mask(monkeypatch):
+    polygons = gpd.GeoDataFrame(geometry=[geometry.box(0, 0, 1, 1), geometry.box(10, 10, 11, 11)], crs='EPSG:4326')
+    reads = []
+
+    def mock_read_file(source, mask):
+        reads.append(mask)
+        return polygons[polygons.intersects(mask.unary_union)]
+
+    monkeypatch.setattr(water_mask.gpd, 'read_file', mock_read_file)
+    monkeypatch.setattr(water_mask, '_water_mask_extract', None)
+
+    first = gpd.GeoDataFrame(index=[0], geometry=[geometry.box(-1, -1, 2, 2)], crs='EPSG:4326')
+    water_mask.prefetch_water_mask(first)
+    second = gpd.GeoDataFrame(index=[0], geometry=[geometry.box(9, 9, 12, 12)], crs='EPSG:4326')
+    water_mask.prefetch_water_mask(second)
+    assert water_mask._water_mask_extract[0] is second
+
+    envelope = gpd.GeoDataFrame(index=[0], geometry=[geometry.box(10.5, 10.5, 11.5, 11.5)], crs='EPSG:4326')
+    mask = water_mask.read_water_mask(envelope)
+    assert mask.geometry.iloc[0].bounds == (10.5, 10.5, 11.0, 11.0)
+    assert len(reads) == 2
+
+    # only the latest extract is kept, so the first extent is read again
+    envelope = gpd.GeoDataFrame(index=[0], geometry=[geometry.box(0.5, 0.5, 1.5, 1.5)], crs='EPSG:4326')
+    mask = water_mask.read_water_mask(envelope)
+    assert mask.geometry.iloc[0].bounds == (0.5, 0.5, 1.0, 1.0)
+    assert len(reads) == 3
+
+
+def test_import_water_mask(tmp_path, monkeypatch):
+    monkeypatch.setenv('HYP3_GAMMA_CACHE_DIR', str(tmp_path / 'cache'))
+    assert water_mask.get_water_mask_source() == water_mask.WATER_MASK_SHAPEFILE
+
+    land = tmp_path / 'land.geojson'
+    land.write_text(json.dumps({
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'properties': {}, 'geometry': geometry.mapping(geometry.box(0, 0, 1, 1))},
+            {'type': 'Feature', 'properties': {}, 'geometry': geometry.mapping(geometry.box(10, 10, 11, 11))},
+        ],
+    }))
+    water_mask.import_water_mask(str(land))
+
+    store = tmp_path / 'cache' / 'water_mask' / 'hyp3_water_mask_20220912.gpkg'
+    assert water_mask.get_water_mask_source() == str(store)
+    assert gdal.OpenEx(str(store)).GetLayer().GetName() == 'water_mask'
+
+    envelope = gpd.GeoDataFrame(index=[0], geometry=[geometry.box(0.5, 0.5, 2, 2)], crs='EPSG:4326')
+    mask = water_mask.read_water_mask(envelope)
+    assert len(mask) == 1
+    assert mask.geometry.iloc[0].bounds == (0.5, 0.5, 1.0, 1.0)